@@ -0,0 +1,58 @@
+"""Times the vectorized sales_frame / split_sales against the old iterrows loop on synthetic parcels.
+
+Run from the repository root: python -m benchmarks.bench_sales_frame
+"""
+from home_values.data import sales_frame, split_sales
+import time
+import numpy as np
+import pandas as pd
+
+
+def synthetic(parcels, seed=0):
+    rng = np.random.default_rng(seed)
+    addresses = [f"{number} SYNTHETIC ST" for number in range(parcels)]
+    sales_per_parcel = rng.integers(1, 4, parcels)
+    sales = pd.DataFrame({
+        'address': np.repeat(addresses, sales_per_parcel),
+        'year': rng.integers(2018, 2026, sales_per_parcel.sum()),
+        'price': rng.integers(150_000, 600_000, sales_per_parcel.sum()),
+    })
+    sales = sales.drop_duplicates(['address', 'year'])
+    sales['seq'] = sales.groupby('address').cumcount()
+    df = pd.DataFrame({'address': addresses, 'square_feet': rng.integers(900, 3500, parcels).astype(float)})
+    df['total_sqft'] = df['square_feet']
+    df['most_recent_sales_price'] = df['address'].map(sales[sales['seq'] == 0].set_index('address')['price'])
+    return df, sales
+
+
+def iterrows_sales(df, sales):
+    history = sales.groupby('address').apply(lambda group: dict(zip(group['year'], group['price'])))
+    df = df.assign(sales_prices=df['address'].map(history))
+    new_rows = []
+    for _, row in df.dropna(subset=['square_feet', 'most_recent_sales_price']).iterrows():
+        for year, price in row['sales_prices'].items():
+            new_rows.append({'address': row['address'], 'total_sqft': row['total_sqft'], 'year': int(year),
+                             'sales_price': int(price), 'price_per_sqft': price / row['total_sqft'] if row['total_sqft'] > 0 else 0})
+    df_sales = pd.DataFrame(new_rows)
+    initial = df_sales.sort_values(by='year').groupby('address').head(1)
+    return df_sales, initial, df_sales[~df_sales.index.isin(initial.index)]
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def main():
+    print(f"{'parcels':>10} {'iterrows (s)':>14} {'vectorized (s)':>16}")
+    for parcels in (1_000, 10_000, 100_000, 250_000):
+        df, sales = synthetic(parcels)
+        vectorized = timed(lambda: split_sales(sales_frame(df, sales)))
+        # The old loop takes tens of seconds past 10k parcels, so it is only timed on the smaller sizes
+        loop = f"{timed(iterrows_sales, df, sales):.3f}" if parcels <= 10_000 else "-"
+        print(f"{parcels:>10,} {loop:>14} {vectorized:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
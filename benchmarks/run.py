@@ -0,0 +1,185 @@
+"""Times the scraper parser and the dashboard data paths on synthetic parcels and saves the results as JSON.
+
+Run from the repository root:
+
+    python -m benchmarks.run                        # 1,000 and 100,000 parcels
+    python -m benchmarks.run 1000 100000 1000000    # county scale
+    python -m benchmarks.run --compare benchmarks/results/previous.json
+
+Every stage is timed on its own, then the whole pipeline runs again under tracemalloc to
+record the peak Python memory of each stage (skip that pass with --no-memory).
+"""
+from benchmarks.synthetic import write_html, write_output
+from home_values import models, trends
+from home_values.data import derive_features, filter_properties, load_dataset, sales_frame, split_sales, yearly_stats
+from home_values.explorer import PropertyIndex
+from home_values.parsing import parse_detail_page, parse_more_detail_page
+from home_values.predict import score_frame
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import sklearn
+
+# Property Explorer defaults from dashboard.py
+explorer_filters = dict(min_sqft=0, max_sqft=5000, min_beds=1, max_beds=6, min_baths=1.0, min_year=2018, max_year=2025)
+
+
+def parse_pages(pages):
+    for detail_path, more_path in pages:
+        with open(detail_path) as file:
+            row, more_url, errors = parse_detail_page(file.read(), "file:///")
+        if more_path:
+            with open(more_path) as file:
+                fields, more_errors = parse_more_detail_page(file.read())
+            row.update(fields)
+
+
+def chart_aggregates(df_sales, df_initial):
+    """The per-year tables and quadratic trend lines behind the Market Trends charts, recomputed from scratch."""
+    yearly_stats(df_sales)
+    df_sales.groupby('year').size()
+    df_sales.groupby('year')['sales_price'].mean()
+    for frame in (df_sales, df_initial):
+        if frame['year'].nunique() > 2:
+            np.polyfit(frame['year'], frame['price_per_sqft'], 2)
+
+
+def trends_charts(aggregates, directory):
+    for chart_type in trends.chart_types:
+        trends.chart_png(aggregates, chart_type, directory)
+
+
+def stages(directory, parcels, html_pages, seed):
+    """Yields (name, function) pairs; each function runs one stage and returns what later stages need."""
+    path = os.path.join(directory, "output.csv")
+    cache = os.path.join(directory, "cache")
+    state = {}
+
+    def generate():
+        write_output(path, parcels, seed)
+
+    def generate_html():
+        state['pages'] = write_html(os.path.join(directory, "html"), html_pages, seed)
+
+    def cold_load():
+        state['dataset'] = load_dataset(path, cache)
+
+    def warm_load():
+        state['dataset'] = load_dataset(path, cache)
+
+    def features():
+        state['df'] = derive_features(state['dataset'])
+
+    def train():
+        state['models'] = models.train_models(state['df'])
+
+    def explorer_index():
+        state['explorer'] = PropertyIndex(state['df'])
+
+    def explorer_query():
+        state['explorer'].page(state['explorer'].positions(**explorer_filters), 0)
+
+    def sales():
+        state['df_sales'] = sales_frame(state['df'], state['dataset']['sales'])
+        state['df_initial'], state['df_resale'] = split_sales(state['df_sales'])
+
+    def trend_aggregates():
+        state['trends'] = trends.TrendAggregates(state['df_sales'])
+
+    yield "generate", generate
+    if html_pages:
+        yield "generate_html", generate_html
+        yield "parse_html", lambda: parse_pages(state['pages'])
+    yield "load_cold", cold_load
+    yield "load_warm", warm_load
+    yield "derive_features", features
+    yield "train_models", train
+    yield "predict", lambda: score_frame(state['df'].copy(), *state['models'])
+    yield "filter_properties", lambda: filter_properties(state['df'], **explorer_filters)
+    yield "explorer_index", explorer_index
+    yield "explorer_query", explorer_query
+    yield "sales_frame", sales
+    yield "chart_aggregates", lambda: chart_aggregates(state['df_sales'], state['df_initial'])
+    yield "trends_build", trend_aggregates
+    yield "trends_query", lambda: (state['trends'].yearly_stats(), state['trends'].trend('all'), state['trends'].trend('initial'))
+    yield "trends_charts", lambda: trends_charts(state['trends'], os.path.join(directory, "trends"))
+
+
+def run(parcels, html_pages, seed, memory):
+    """Runs every stage for one dataset size and returns {stage: {'seconds': ..., 'peak_mb': ...}}."""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="home_values_bench_") as directory:
+        for name, stage in stages(directory, parcels, html_pages, seed):
+            start = time.perf_counter()
+            stage()
+            results[name] = {'seconds': round(time.perf_counter() - start, 4)}
+            if name == "parse_html":
+                results[name]['pages_per_second'] = round(html_pages / max(results[name]['seconds'], 1e-9), 1)
+
+    if memory:
+        with tempfile.TemporaryDirectory(prefix="home_values_bench_") as directory:
+            for name, stage in stages(directory, parcels, html_pages, seed):
+                tracemalloc.start()
+                stage()
+                results[name]['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+                tracemalloc.stop()
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def compare(current, previous):
+    """Prints how much slower or faster every stage got since a previous results file."""
+    for size, stages_now in current['sizes'].items():
+        before = previous.get('sizes', {}).get(size, {})
+        for name, result in stages_now.items():
+            if name in before and before[name]['seconds'] > 0:
+                change = result['seconds'] / before[name]['seconds'] - 1
+                print(f"{size:>9} {name:<18} {before[name]['seconds']:>9.3f}s -> {result['seconds']:>9.3f}s  {change:+.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing and the dashboard data paths on synthetic parcels.")
+    parser.add_argument("sizes", type=int, nargs="*", default=[1000, 100_000], help="numbers of parcels to generate")
+    parser.add_argument("--html", type=int, default=200, help="fake assessor pages to parse per size (0 to skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", time.strftime("%Y%m%d-%H%M%S") + ".json"))
+    parser.add_argument("--compare", help="a previous results file to compare against")
+    args = parser.parse_args()
+
+    results = {'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'environment': environment(), 'seed': args.seed, 'sizes': {}}
+    for parcels in args.sizes:
+        print(f"Benchmarking {parcels:,} parcels")
+        results['sizes'][str(parcels)] = run(parcels, min(args.html, parcels), args.seed, not args.no_memory)
+        for name, result in results['sizes'][str(parcels)].items():
+            print(f"  {name:<18} {result['seconds']:>9.3f}s" + (f"  {result['peak_mb']:>9.1f} MB" if 'peak_mb' in result else ""))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
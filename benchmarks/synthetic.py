@@ -0,0 +1,144 @@
+"""Synthetic parcel generator for benchmarks.
+
+Writes output.csv-compatible files (plus the long market value and sales tables the scraper
+writes next to them) and, optionally, fake assessor detail pages laid out like the real ones.
+
+    python -m benchmarks.synthetic 100000 /tmp/synthetic/output.csv --html 200
+"""
+from home_values.parsing import fieldnames
+from home_values.sinks import write_rows
+import argparse
+import csv
+import os
+import numpy as np
+
+streets = ["PEDALERS LN", "PIONEER ST", "RUNWAY BLVD", "OSO AVE", "SW 16TH ST", "WHEELER ST", "HANGAR DR"]
+
+
+def generate_rows(parcels, seed=0):
+    """Yields scraped-style rows with plausible, correlated values."""
+    rng = np.random.default_rng(seed)
+    for number in range(parcels):
+        address = f"{1000 + number // len(streets)} {streets[number % len(streets)]}"
+        row = {'address': address, 'square_feet': None, 'market_values': {}, 'sales_prices': {}, 'year_built': None,
+               'bedrooms': None, 'bathrooms': None, 'garage_sqft': 0, 'garage_apt_sqft': 0, 'porch_sqft': 0,
+               'unfin_attic_sqft': 0}
+
+        # About 1 in 20 parcels is an empty lot without a building record or sales
+        if rng.random() < 0.05:
+            yield row
+            continue
+
+        square_feet = int(rng.integers(800, 3600))
+        year_built = int(rng.integers(2018, 2026))
+        row.update({
+            'square_feet': square_feet,
+            'year_built': year_built,
+            'bedrooms': int(np.clip(square_feet // 600 + rng.integers(0, 2), 1, 6)),
+            'bathrooms': float(rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0])),
+            'garage_sqft': int(rng.choice([0, 0, 240, 400, 480])),
+            'porch_sqft': int(rng.integers(0, 120)),
+            'unfin_attic_sqft': int(rng.choice([0, 0, 0, 150])),
+        })
+        if row['garage_sqft'] and rng.random() < 0.1:
+            row['garage_apt_sqft'] = int(rng.integers(300, 600))
+
+        # Market values are listed newest first, starting the year after the home was built
+        value = square_feet * rng.uniform(180, 260)
+        for year in range(2026, max(year_built, 2021), -1):
+            row['market_values'][year] = int(value)
+            value *= rng.uniform(0.93, 1.0)
+
+        # An initial sale when the home was finished and, sometimes, a resale
+        years = [min(2025, year_built + int(rng.integers(0, 2)))]
+        if rng.random() < 0.2 and years[0] < 2025:
+            years.append(int(rng.integers(years[0] + 1, 2026)))
+        for year in sorted(years, reverse=True):
+            row['sales_prices'][year] = int(square_feet * rng.uniform(170, 280) * (1 + 0.04 * (year - 2018)))
+        yield row
+
+
+def write_output(path, parcels, seed=0, legacy=False):
+    """Writes parcels to path. legacy=True writes only the dict-column CSV, like scrapes made before the long tables."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if not legacy:
+        return write_rows(generate_rows(parcels, seed), path)
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(generate_rows(parcels, seed))
+    return parcels
+
+
+# The assessor tables end in two rows that are not data, which the parser skips
+footer = [["&nbsp;"], ["&nbsp;"]]
+
+
+def table(rows):
+    return "<table>" + "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>" for cells in rows) + "</table>"
+
+
+def page(tables):
+    """Lays out tables as body children so the parser's table:nth-child(n) selectors find them."""
+    filler = "<table><tr><td><p>&nbsp;</p></td></tr></table>"
+    return "<html><body>" + "".join(tables.get(position, filler) for position in range(1, max(tables) + 1)) + "</body></html>"
+
+
+def detail_page(row, more_detail_href="more.html"):
+    p = "<p>{}</p>".format
+    address = table([[p(""), p(""), p(""), p(""), p(f"{row['address']}, OKLAHOMA CITY")]])
+    market = table([[p(year), p(f"{value:,}")] for year, value in row['market_values'].items()] + footer)
+    sales = table([[p(f"01/15/{year}"), "", "", "", "", p(f"${price:,}")] for year, price in row['sales_prices'].items()] + footer)
+    building = table([["Building 1", f'<a href="{more_detail_href}">More detail</a>']]) if row['square_feet'] else table([[""]])
+    return page({4: address, 7: market, 10: sales, 13: building})
+
+
+def more_detail_page(row):
+    font = "<font>{}</font>".format
+    lines = [[font(""), font("")] for _ in range(22)]
+    lines[4] = [font("Square Feet"), font(f"{row['square_feet']:,}")]
+    lines[5] = [font("Year Built"), font(row['year_built'])]
+    lines[19] = [font("Bedrooms"), font(f"(1) Bedrooms {row['bedrooms']}")]
+    full, half = int(row['bathrooms']), int(row['bathrooms'] % 1 * 2)
+    lines[20] = [font("Bathrooms"), font(f"({full}) Full ({0}) 3/4 ({half}) Half")]
+    p = "<p>{}</p>".format
+    outbuildings = [[p("#"), p("Type"), p(""), p("Area")]]
+    for code, column in (("Gar Attached", 'garage_sqft'), ("GarApart", 'garage_apt_sqft'), ("Por Open", 'porch_sqft'), ("UA Attic", 'unfin_attic_sqft')):
+        if row[column]:
+            outbuildings.append([p(len(outbuildings)), p(code), p(""), p(row[column] - (row['garage_apt_sqft'] if column == 'garage_sqft' else 0))])
+    outbuildings += [[p(""), p("Total"), p(""), p("")], ["&nbsp;"]]
+    return page({4: table([[table(lines)]]), 5: table(outbuildings)})
+
+
+def write_html(directory, pages, seed=0):
+    """Writes detail and more-detail pages for the first `pages` parcels."""
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for number, row in zip(range(pages), generate_rows(pages, seed)):
+        detail_path = os.path.join(directory, f"detail_{number}.html")
+        more_path = os.path.join(directory, f"more_{number}.html")
+        with open(detail_path, 'w') as file:
+            file.write(detail_page(row, f"more_{number}.html"))
+        if row['square_feet']:
+            with open(more_path, 'w') as file:
+                file.write(more_detail_page(row))
+        written.append((detail_path, more_path if row['square_feet'] else None))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic scraper output for benchmarks.")
+    parser.add_argument("parcels", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--legacy", action="store_true", help="only write the dict-column CSV")
+    parser.add_argument("--html", type=int, default=0, help="also write this many fake assessor pages next to the output")
+    args = parser.parse_args()
+
+    write_output(args.output, args.parcels, args.seed, args.legacy)
+    if args.html:
+        write_html(os.path.join(os.path.dirname(os.path.abspath(args.output)), "html"), args.html, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,8 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import ast
-import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression, Ridge
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
-from sklearn.compose import ColumnTransformer
+from home_values import models, trends
+from home_values.data import load_dataset, derive_features, sales_frame
+from home_values.explorer import PropertyIndex, pages
+from home_values.model_selection import read_leaderboard
 
 # Page config
 st.set_page_config(
@@ -19,108 +14,43 @@ st.set_page_config(
 @st.cache_data
 def load_data():
     """Load and preprocess the property data."""
-    df = pd.read_csv('output.csv')
+    # Memory-maps the cached properties, market value and sales tables (parsed once per version of output.csv)
+    dataset = load_dataset('output.csv')
 
-    # Remove specific addresses
-    remove_addresses = ['900 HANGAR DR', '934 HANGAR DR']
-    df = df[~df['address'].isin(remove_addresses)]
+    # Add the most recent values and derived features, leaving out the excluded addresses
+    df = derive_features(dataset)
 
-    # Convert string representations of dictionaries
-    df['market_values'] = df['market_values'].apply(lambda x: ast.literal_eval(x) if pd.notna(x) else {})
-    df['sales_prices'] = df['sales_prices'].apply(lambda x: ast.literal_eval(x) if pd.notna(x) else {})
+    return df, dataset['sales'], dataset['version']
 
-    # Extract most recent values
-    get_most_recent = lambda x: next(iter(x.values())) if x else None
-    df['most_recent_sales_year'] = df['sales_prices'].apply(lambda x: next(iter(x.keys())) if x else None)
-    df['most_recent_sales_price'] = df['sales_prices'].apply(get_most_recent)
-    df['most_recent_market_value'] = df['market_values'].apply(get_most_recent)
+@st.cache_resource
+def train_models(_df, version):
+    """Load the models fitted on this data from the model registry, training them only if the data changed."""
+    return models.load_or_train(_df)
 
-    # Create derived features
-    df['total_sqft'] = df['square_feet'].fillna(0) + df['unfin_attic_sqft'].fillna(0) + df['garage_apt_sqft'].fillna(0)
-    df['has_garage'] = df['garage_sqft'].apply(lambda x: 1 if x > 0 else 0)
-    df['has_apt'] = df['garage_apt_sqft'].apply(lambda x: 1 if x > 0 else 0)
+# Leading underscores keep Streamlit from hashing the frames; the data version is the cache key
+@st.cache_data
+def create_sales_dataframe(_df, _sales, version):
+    """Create expanded sales dataframe for trend analysis."""
+    return sales_frame(_df, _sales)
 
-    # Calculate price per sqft
-    df['price_per_sqft'] = df.apply(
-        lambda row: row['most_recent_sales_price'] / row['total_sqft'] if row['total_sqft'] > 0 and pd.notna(row['most_recent_sales_price']) else None,
-        axis=1
-    )
+@st.cache_resource
+def market_trends(_df_sales, version):
+    """Per-year and per-street aggregates and trend lines of the sales."""
+    return trends.TrendAggregates(_df_sales)
 
-    return df
+@st.cache_data
+def trend_chart(_aggregates, chart_type, version):
+    """PNG of one Market Trends chart, rendered once per chart and content of the sales."""
+    return trends.chart_png(_aggregates, chart_type)
 
 @st.cache_resource
-def train_models(df):
-    """Train the prediction models."""
-    # Filter data
-    filtered_df = df.dropna(subset=['square_feet', 'most_recent_sales_price', 'most_recent_market_value'])
-
-    # Remove outliers
-    column = 'price_per_sqft'
-    filtered_df = filtered_df.dropna(subset=[column])
-    mean = filtered_df[column].mean()
-    std = filtered_df[column].std()
-    z_scores = (filtered_df[column] - mean) / std
-    filtered_df = filtered_df[np.abs(z_scores) <= 2]
-
-    # Prepare features
-    X = filtered_df[['total_sqft', 'year_built', 'bedrooms', 'bathrooms', 'has_garage', 'has_apt']].values
-    y_market = filtered_df['most_recent_market_value'].values
-
-    # Preprocessing
-    numerical_columns = [0, 1, 2, 3]
-    binary_columns = [4, 5]
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', StandardScaler(), numerical_columns),
-            ('binary', 'passthrough', binary_columns)
-        ])
-
-    # Train market value model (Ridge)
-    X_train, X_test, y_train, y_test = train_test_split(X, y_market, test_size=0.2, random_state=1)
-    market_model = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('regressor', Ridge(alpha=1.0))
-    ])
-    market_model.fit(X_train, y_train)
-
-    # Train sales price model (recent sales only)
-    recent_df = filtered_df[filtered_df['most_recent_sales_year'] >= 2024]
-    X_sales = recent_df[['total_sqft', 'year_built', 'bedrooms', 'bathrooms', 'has_garage', 'has_apt']].values
-    y_sales = recent_df['most_recent_sales_price'].values
-
-    X_train_s, X_test_s, y_train_s, y_test_s = train_test_split(X_sales, y_sales, test_size=0.3, random_state=0)
-    sales_model = LinearRegression()
-    sales_model.fit(X_train_s, y_train_s)
-
-    return market_model, sales_model
-
-def create_sales_dataframe(df):
-    """Create expanded sales dataframe for trend analysis."""
-    filtered_df = df.dropna(subset=['square_feet', 'most_recent_sales_price'])
-
-    new_rows = []
-    for _, row in filtered_df.iterrows():
-        address = row['address']
-        total_sqft = row['total_sqft']
-        sales_data = row['sales_prices']
-
-        for year, price in sales_data.items():
-            year = int(year)
-            sales_price = int(price)
-            sales_price_sqft = price / total_sqft if total_sqft > 0 else 0
-            new_rows.append({
-                'address': address,
-                'total_sqft': total_sqft,
-                'year': year,
-                'sales_price': sales_price,
-                'price_per_sqft': sales_price_sqft
-            })
-
-    return pd.DataFrame(new_rows)
+def property_index(_df, version):
+    """Sorted filter indexes and formatted display rows for the Property Explorer."""
+    return PropertyIndex(_df)
 
 # Load data and models
-df = load_data()
-market_model, sales_model = train_models(df)
+df, sales, data_version = load_data()
+market_model, sales_model = train_models(df, data_version)
 
 # Title
 st.title("🏠 Wheeler Home Values Dashboard")
@@ -154,36 +84,20 @@ with tab1:
         max_year = st.number_input("Max Year Built", value=2025, step=1)
 
     # Apply filters
-    filtered = df.copy()
-    filtered = filtered[filtered['total_sqft'] >= min_sqft]
-    filtered = filtered[filtered['total_sqft'] <= max_sqft]
-    filtered = filtered[filtered['bedrooms'] >= min_beds]
-    filtered = filtered[filtered['bedrooms'] <= max_beds]
-    filtered = filtered[filtered['bathrooms'] >= min_baths]
-    filtered = filtered[filtered['year_built'] >= min_year]
-    filtered = filtered[filtered['year_built'] <= max_year]
-
-    if has_garage_filter == "Yes":
-        filtered = filtered[filtered['has_garage'] == 1]
-    elif has_garage_filter == "No":
-        filtered = filtered[filtered['has_garage'] == 0]
+    explorer = property_index(df, data_version)
+    matches = explorer.query(min_sqft, max_sqft, min_beds, max_beds, min_baths, min_year, max_year, has_garage_filter)
 
     # Display results
-    st.markdown(f"**Found {len(filtered)} properties**")
-
-    # Select columns to display
-    display_cols = ['address', 'total_sqft', 'bedrooms', 'bathrooms', 'year_built',
-                    'most_recent_sales_price', 'most_recent_market_value', 'garage_sqft']
+    st.markdown(f"**Found {len(matches)} properties**")
 
-    display_df = filtered[display_cols].copy()
-    display_df.columns = ['Address', 'Total Sq Ft', 'Beds', 'Baths', 'Year Built',
-                          'Last Sale Price', 'Market Value', 'Garage Sq Ft']
+    # Only the page being looked at is formatted into a table
+    page_col, size_col = st.columns([3, 1])
+    with size_col:
+        page_size = st.selectbox("Rows per page", options=[50, 100, 250, 500], index=1)
+    with page_col:
+        page_number = st.number_input("Page", min_value=1, max_value=pages(matches, page_size), value=1, step=1)
 
-    # Format currency columns
-    display_df['Last Sale Price'] = display_df['Last Sale Price'].apply(lambda x: f"${x:,.0f}" if pd.notna(x) else "N/A")
-    display_df['Market Value'] = display_df['Market Value'].apply(lambda x: f"${x:,.0f}" if pd.notna(x) else "N/A")
-
-    st.dataframe(display_df, use_container_width=True, hide_index=True)
+    st.dataframe(explorer.page(matches, page_number - 1, page_size), use_container_width=True, hide_index=True)
 
 # ============ TAB 2: Price Predictions ============
 with tab2:
@@ -222,13 +136,23 @@ with tab2:
         st.caption("*Market value predictions use Ridge Regression trained on all available data.*")
         st.caption("*Sales price predictions use Linear Regression trained on 2024+ sales data.*")
 
+    # Cross-validation results written by python -m home_values.model_selection
+    leaderboard, report = read_leaderboard()
+    if leaderboard is not None and not leaderboard.empty:
+        st.subheader("Model Leaderboard")
+        st.caption(f"{report['folds']}-fold cross-validation from {report['created']}"
+                   + ("" if report['dataset_hash'] == models.dataset_hash(df) else " (on an older version of the data)"))
+        st.dataframe(leaderboard[['target', 'model', 'rmse', 'mae', 'r2', 'r2_std', 'fit_seconds']],
+                     use_container_width=True, hide_index=True)
+
 # ============ TAB 3: Market Trends ============
 with tab3:
     st.header("Market Trends")
     st.markdown("Analyze price trends over time in the Wheeler area")
 
-    # Create sales dataframe
-    df_sales = create_sales_dataframe(df)
+    # Create sales dataframe and its aggregates
+    df_sales = create_sales_dataframe(df, sales, data_version)
+    aggregates = market_trends(df_sales, data_version)
 
     # Summary metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -237,85 +161,33 @@ with tab3:
     with col2:
         st.metric("Total Sales Records", len(df_sales))
     with col3:
-        avg_price_2024 = df_sales[df_sales['year'] >= 2024]['price_per_sqft'].mean()
+        avg_price_2024 = aggregates.mean_price_per_sqft(2024)
         st.metric("Avg $/SqFt (2024+)", f"${avg_price_2024:,.0f}")
     with col4:
-        avg_price_2019 = df_sales[df_sales['year'] == 2019]['price_per_sqft'].mean()
+        avg_price_2019 = aggregates.mean_price_per_sqft(2019, 2019)
         pct_change = ((avg_price_2024 - avg_price_2019) / avg_price_2019) * 100
         st.metric("Price Change (2019-2024)", f"+{pct_change:.1f}%")
 
     st.markdown("---")
 
-    # Chart selection
-    chart_type = st.selectbox("Select Chart", options=[
-        "All Sales - Price/Sq Ft by Year",
-        "Initial Sales - Price/Sq Ft by Year",
-        "Sales Volume by Year",
-        "Average Sales Price by Year"
-    ])
-
-    fig, ax = plt.subplots(figsize=(10, 6))
-
-    if chart_type == "All Sales - Price/Sq Ft by Year":
-        ax.scatter(df_sales['year'], df_sales['price_per_sqft'], alpha=0.6, color='blue')
-
-        # Trend line
-        coefficients = np.polyfit(df_sales['year'], df_sales['price_per_sqft'], 2)
-        trend_line = np.poly1d(coefficients)
-        x_values = np.linspace(df_sales['year'].min(), df_sales['year'].max(), 100)
-        ax.plot(x_values, trend_line(x_values), color='red', linewidth=2, label='Trend')
-
-        ax.set_xlabel('Year')
-        ax.set_ylabel('Price per Square Foot ($)')
-        ax.set_title('All Sales - Price per Square Foot by Year')
-        ax.grid(True, alpha=0.3)
-
-    elif chart_type == "Initial Sales - Price/Sq Ft by Year":
-        df_initial = df_sales.sort_values(by='year').groupby('address').head(1)
-        ax.scatter(df_initial['year'], df_initial['price_per_sqft'], alpha=0.6, color='green')
-
-        # Trend line
-        coefficients = np.polyfit(df_initial['year'], df_initial['price_per_sqft'], 2)
-        trend_line = np.poly1d(coefficients)
-        x_values = np.linspace(df_initial['year'].min(), df_initial['year'].max(), 100)
-        ax.plot(x_values, trend_line(x_values), color='red', linewidth=2, label='Trend')
-
-        ax.set_xlabel('Year')
-        ax.set_ylabel('Price per Square Foot ($)')
-        ax.set_title('Initial Sales - Price per Square Foot by Year')
-        ax.grid(True, alpha=0.3)
-
-    elif chart_type == "Sales Volume by Year":
-        sales_by_year = df_sales.groupby('year').size()
-        ax.bar(sales_by_year.index, sales_by_year.values, color='steelblue')
-        ax.set_xlabel('Year')
-        ax.set_ylabel('Number of Sales')
-        ax.set_title('Sales Volume by Year')
-        ax.grid(True, alpha=0.3, axis='y')
-
-    elif chart_type == "Average Sales Price by Year":
-        avg_by_year = df_sales.groupby('year')['sales_price'].mean()
-        ax.bar(avg_by_year.index, avg_by_year.values, color='coral')
-        ax.set_xlabel('Year')
-        ax.set_ylabel('Average Sales Price ($)')
-        ax.set_title('Average Sales Price by Year')
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
-        ax.grid(True, alpha=0.3, axis='y')
-
-    plt.tight_layout()
-    st.pyplot(fig)
+    # Chart selection; each chart is drawn once per content of the sales
+    chart_type = st.selectbox("Select Chart", options=trends.chart_types)
+    st.image(trend_chart(aggregates, chart_type, aggregates.version), use_column_width=True)
 
     # Year-over-year stats table
     st.markdown("### Year-over-Year Statistics")
-    yearly_stats = df_sales.groupby('year').agg({
-        'sales_price': ['count', 'mean', 'median'],
-        'price_per_sqft': 'mean'
-    }).round(0)
-    yearly_stats.columns = ['# Sales', 'Avg Price', 'Median Price', 'Avg $/SqFt']
-    yearly_stats['Avg Price'] = yearly_stats['Avg Price'].apply(lambda x: f"${x:,.0f}")
-    yearly_stats['Median Price'] = yearly_stats['Median Price'].apply(lambda x: f"${x:,.0f}")
-    yearly_stats['Avg $/SqFt'] = yearly_stats['Avg $/SqFt'].apply(lambda x: f"${x:,.0f}")
-    st.dataframe(yearly_stats, use_container_width=True)
+    yearly = aggregates.yearly_stats()
+    yearly['Avg Price'] = yearly['Avg Price'].apply(lambda x: f"${x:,.0f}")
+    yearly['Median Price'] = yearly['Median Price'].apply(lambda x: f"${x:,.0f}")
+    yearly['Avg $/SqFt'] = yearly['Avg $/SqFt'].apply(lambda x: f"${x:,.0f}")
+    st.dataframe(yearly, use_container_width=True)
+
+    # Per-street stats table
+    st.markdown("### Sales by Street")
+    streets = aggregates.street_stats()
+    streets['Avg Price'] = streets['Avg Price'].apply(lambda x: f"${x:,.0f}")
+    streets['Avg $/SqFt'] = streets['Avg $/SqFt'].apply(lambda x: f"${x:,.0f}")
+    st.dataframe(streets, use_container_width=True)
 
 # Footer
 st.markdown("---")
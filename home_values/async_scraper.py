@@ -0,0 +1,119 @@
+from home_values import parcel
+from home_values.browser import AsyncBrowserPool
+from home_values.playwright_scraper import search_url
+from home_values.metrics import Metrics
+from home_values.pacing import Pacer, check_response
+from home_values.planner import SearchPlanner
+import asyncio
+
+
+async def submit(page, input_field):
+    async with page.expect_navigation(wait_until="load") as navigation:
+        await input_field.press("Enter")
+    return await navigation.value
+
+
+async def goto(page, pacer, url, ready_selector):
+    """Opens url through the pacer and waits until ready_selector is on the page."""
+    async def go():
+        # Error pages are retried before waiting for a selector they will never have
+        response = check_response(await page.goto(url, wait_until="domcontentloaded"))
+        await page.wait_for_selector(ready_selector, state="attached")
+        return response
+    return await pacer.call_async(go)
+
+
+async def search(page, address_range, pacer, url=search_url):
+    """Runs a wildcard address search and returns the detail page URLs from the result table."""
+    await pacer.call_async(page.goto, url, wait_until="domcontentloaded")
+
+    # Fills in the Physical Address section and submits its form
+    input_field = page.locator("input[name='FormattedLocation']")
+    await input_field.fill(address_range)
+    await pacer.call_async(submit, page, input_field)
+
+    # Collects every link in the fourth table in one round trip instead of clicking them one by one
+    hrefs = await page.locator("table:nth-child(4) a").evaluate_all("links => links.map(link => link.href)")
+    return list(dict.fromkeys(href for href in hrefs if href))
+
+
+async def scrape_parcel(page, url, pacer, address_list):
+    """Scrapes one parcel detail page (and its "more detail" page) into a CSV row."""
+    async def load(page_url, ready_selector):
+        await goto(page, pacer, page_url, ready_selector)
+        # Takes one snapshot of the page and parses every field from it in Python
+        with pacer.metrics.time('snapshot'):
+            return await page.content(), page.url
+    return await parcel.scrape_parcel_async(load, url, pacer.metrics, address_list)
+
+
+async def worker(page, jobs, pacer, planner, address_list, on_row, url, checkpoint, max_age, failed):
+    """Pulls search and parcel jobs off the shared queue until the crawl is finished."""
+    page.on("dialog", lambda dialog: dialog.dismiss())
+    while True:
+        kind, target = await jobs.get()
+        try:
+            if kind == "search":
+                with pacer.metrics.time('search'):
+                    hrefs = await search(page, target, pacer, url)
+                hrefs, narrower = planner.record(target, hrefs)
+                for address_range in narrower:
+                    jobs.put_nowait(("search", address_range))
+                for href in hrefs:
+                    if checkpoint is None or checkpoint.needs_fetch(href, max_age):
+                        jobs.put_nowait(("parcel", href))
+            else:
+                row = await scrape_parcel(page, target, pacer, address_list)
+                if row is None:
+                    pacer.metrics.count('duplicates')
+                    if checkpoint:
+                        checkpoint.mark_duplicate(target)
+                    continue
+                if checkpoint:
+                    checkpoint.mark_done(target, row)
+                pacer.metrics.count('parcels')
+                on_row(row)
+        except Exception as e:
+            print(f"Error encountered while trying to scrape {target}: {e}")
+            pacer.metrics.count('search_failures' if kind == "search" else 'parcel_failures')
+            if kind == "search":
+                failed.append(target)
+            elif checkpoint:
+                checkpoint.mark_failed(target, e)
+        finally:
+            jobs.task_done()
+
+
+async def scrape(address_ranges, on_row, requests_per_second=0.5, url=search_url, contexts=2, pages_per_context=2, headless=True,
+                 checkpoint=None, max_age=None, planner=None, metrics=None):
+    """Scrapes every address range over a pool of browser contexts and pages sharing one rate limit.
+
+    Returns the address ranges whose search failed.
+    """
+    pacer = Pacer(requests_per_second, metrics=metrics or Metrics())
+    planner = planner or SearchPlanner(None)
+    address_list = set()
+    failed = []
+    jobs = asyncio.Queue()
+    for address_range in planner.plan(address_ranges):
+        jobs.put_nowait(("search", address_range))
+
+    async with AsyncBrowserPool(headless) as pool:
+        pages = []
+        for _ in range(contexts):
+            context = await pool.acquire()
+            for _ in range(pages_per_context):
+                pages.append(await context.new_page())
+
+        # Every page works the same queue, so throughput grows with the pool while the pacer caps requests
+        tasks = [asyncio.create_task(worker(page, jobs, pacer, planner, address_list, on_row, url, checkpoint, max_age, failed)) for page in pages]
+        await jobs.join()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    planner.save()
+    print("Request latency (seconds): ", pacer.stats.summary())
+    print("Search planner: ", planner.counts)
+    pacer.metrics.add_counts('planner', planner.counts)
+    return failed
+
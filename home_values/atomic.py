@@ -0,0 +1,55 @@
+"""Atomic file and directory writes: build the new version next to the old one, then rename it into place.
+
+Readers see either the previous file or the complete new one, never a half-written one. If the
+writing code raises, the partial copy is deleted and the previous file is left as it was.
+"""
+from contextlib import contextmanager
+import os
+import shutil
+import threading
+
+
+def partial_path(path):
+    """A temporary sibling of path that no other process or thread writes to."""
+    return f"{path}.partial-{os.getpid()}-{threading.get_ident()}"
+
+
+def is_partial(path):
+    return ".partial-" in os.path.basename(path)
+
+
+def discard(path):
+    """Deletes a partial file or directory if it exists."""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def sync(file):
+    file.flush()
+    os.fsync(file.fileno())
+
+
+@contextmanager
+def atomic_path(path):
+    """Yields a temporary path to write a file or directory to, renamed over path if the block finishes without raising."""
+    temporary = partial_path(path)
+    try:
+        yield temporary
+    except BaseException:
+        discard(temporary)
+        raise
+    os.replace(temporary, path)
+
+
+@contextmanager
+def atomic_write(path, mode='w', **kwargs):
+    """Opens a temporary file in place of path; it is fsynced and renamed over path if the block finishes without raising."""
+    with atomic_path(path) as temporary:
+        with open(temporary, mode, **kwargs) as file:
+            yield file
+            sync(file)
@@ -0,0 +1,127 @@
+from contextlib import asynccontextmanager, contextmanager
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright  # 'pip install pytest-playwright' and then 'playwright install chromium'
+import time
+
+# The scraper only ever reads the HTML, so these requests are aborted before they leave the browser
+blocked_resources = {"image", "stylesheet", "font", "media"}
+
+
+class Timings:
+    """Records how long browser startup, context creation and teardown take over a run."""
+
+    def __init__(self):
+        self.seconds = {'launch': 0, 'new_context': 0, 'teardown': 0}
+        self.contexts_created = 0
+        self.contexts_reused = 0
+
+    @contextmanager
+    def measure(self, step):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[step] += time.perf_counter() - started
+
+    def report(self):
+        print("Browser timings (seconds): ", {step: round(seconds, 3) for step, seconds in self.seconds.items()})
+        print(f"Browser contexts: {self.contexts_created} created, {self.contexts_reused} reused")
+
+
+def block_route(route):
+    if route.request.resource_type in blocked_resources:
+        return route.abort()
+    return route.continue_()
+
+
+class BrowserPool:
+    """Launches Chromium once and hands out warm, isolated browser contexts from a pool.
+
+    Each context keeps its own cookies and cache, so a context handed back to the pool
+    is reused by the next address range instead of paying for a fresh one.
+    """
+
+    def __init__(self, headless=True, block=True):
+        self.headless = headless
+        self.block = block
+        self.idle = []
+        self.contexts = []
+        self.timings = Timings()
+
+    def __enter__(self):
+        with self.timings.measure('launch'):
+            self.playwright = sync_playwright().start()
+            # self.browser = self.playwright.chromium.launch(executable_path="/Users/kaylachristopher/Library/Caches/ms-playwright/chromium-1041/chrome-mac/Chromium.app/Contents/MacOS/Chromium", headless=self.headless, timeout=5000)
+            self.browser = self.playwright.chromium.launch(headless=self.headless, timeout=5000)
+        return self
+
+    def __exit__(self, *exc):
+        with self.timings.measure('teardown'):
+            for context in self.contexts:
+                context.close()
+            self.browser.close()
+            self.playwright.stop()
+        self.timings.report()
+
+    def acquire(self):
+        if self.idle:
+            self.timings.contexts_reused += 1
+            return self.idle.pop()
+        with self.timings.measure('new_context'):
+            context = self.browser.new_context()
+            if self.block:
+                context.route("**/*", block_route)
+        self.timings.contexts_created += 1
+        self.contexts.append(context)
+        return context
+
+    @contextmanager
+    def page(self):
+        """Yields a new page in a pooled context and returns the context to the pool afterwards."""
+        context = self.acquire()
+        page = context.new_page()
+        try:
+            yield page
+        finally:
+            page.close()
+            self.idle.append(context)
+
+
+class AsyncBrowserPool(BrowserPool):
+    """BrowserPool for playwright.async_api."""
+
+    async def __aenter__(self):
+        with self.timings.measure('launch'):
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(headless=self.headless, timeout=5000)
+        return self
+
+    async def __aexit__(self, *exc):
+        with self.timings.measure('teardown'):
+            for context in self.contexts:
+                await context.close()
+            await self.browser.close()
+            await self.playwright.stop()
+        self.timings.report()
+
+    async def acquire(self):
+        if self.idle:
+            self.timings.contexts_reused += 1
+            return self.idle.pop()
+        with self.timings.measure('new_context'):
+            context = await self.browser.new_context()
+            if self.block:
+                await context.route("**/*", block_route)
+        self.timings.contexts_created += 1
+        self.contexts.append(context)
+        return context
+
+    @asynccontextmanager
+    async def page(self):
+        context = await self.acquire()
+        page = await context.new_page()
+        try:
+            yield page
+        finally:
+            await page.close()
+            self.idle.append(context)
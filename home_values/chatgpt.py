@@ -1,15 +1,48 @@
+"""OpenAI chat helpers: chat_with_gpt for a single prompt, and an async batch client for thousands of them.
+
+    python -m home_values.chatgpt prompts.txt --output responses.jsonl
+    python -m home_values.chatgpt --parcels output.csv --output summaries.jsonl --concurrency 16
+    python -m home_values.chatgpt prompts.txt --base-url http://127.0.0.1:8000/v1   # a local OpenAI-compatible server
+
+The batch client keeps a bounded number of requests in flight, paces them through a
+requests-per-minute and a tokens-per-minute bucket, retries rate limits and server errors with
+backoff, and stores every response in a SQLite cache keyed by a hash of the model and the
+prompt, so the same prompt is never paid for twice.
+"""
+from home_values.atomic import atomic_write
+from home_values.pacing import Backoff, LatencyStats, TokenBucket
+import argparse
+import asyncio
+import hashlib
+import json
 import os
+import sqlite3
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APIConnectionError, APIStatusError, APITimeoutError, AsyncOpenAI, OpenAI
 
 # Load environment variables from the .env file
 load_dotenv("./openai_key.env")
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+default_model = "gpt-3.5-turbo"
+system_prompt = "You are a helpful assistant."
+cache_path = "chatgpt_cache.db"
+
+# Status codes worth retrying: timeouts, conflicts, rate limits and server errors
+retry_statuses = (408, 409, 429, 500, 502, 503, 504)
+
+# Completion tokens reserved for a request whose max_tokens is not set
+expected_completion_tokens = 256
+
+client = None
+
 
 # Function to interact with OpenAI API
 def chat_with_gpt(prompt):
+    global client
     try:
+        if client is None:
+            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         # Call the Chat API
         response = client.chat.completions.create(model="gpt-3.5-turbo",  # Replace with "gpt-3.5-turbo" if using that model
         messages=[
@@ -22,7 +55,240 @@ def chat_with_gpt(prompt):
     except Exception as e:
         return f"Error: {e}"
 
-# Test the function
+
+def prompt_key(model, messages, temperature, max_tokens):
+    """Cache key of a request: a hash of everything that changes the answer."""
+    request = json.dumps([model, messages, temperature, max_tokens], sort_keys=True)
+    return hashlib.sha256(request.encode()).hexdigest()
+
+
+def estimate_tokens(messages, max_tokens):
+    """A rough token count (4 characters per token) reserved before the request; settled with the real usage after."""
+    return sum(len(message['content']) for message in messages) // 4 + (max_tokens or expected_completion_tokens)
+
+
+def retryable(e):
+    if isinstance(e, (APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(e, APIStatusError) and e.status_code in retry_statuses
+
+
+class ResponseCache:
+    """Chat responses stored in SQLite by prompt_key, with the tokens they cost."""
+
+    def __init__(self, path=cache_path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                created REAL NOT NULL
+            )
+        """)
+        self.db.commit()
+
+    def get(self, key):
+        return self.db.execute("SELECT response, prompt_tokens, completion_tokens FROM responses WHERE key = ?", (key,)).fetchone()
+
+    def put(self, key, model, response, prompt_tokens, completion_tokens):
+        self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, model, response, prompt_tokens, completion_tokens, time.time()))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+class ChatStats:
+    """Requests, cache hits, retries, failures, tokens and latency of a batch."""
+
+    def __init__(self):
+        self.counts = {'prompts': 0, 'requests': 0, 'cache_hits': 0, 'retries': 0, 'failures': 0,
+                       'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens_saved': 0}
+        self.latency = LatencyStats()
+        self.rate_limit_wait = 0
+        self.started = time.monotonic()
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            **self.counts,
+            'elapsed_seconds': round(elapsed, 2),
+            'prompts_per_second': round(self.counts['prompts'] / elapsed, 2) if elapsed else 0,
+            'rate_limit_wait_seconds': round(self.rate_limit_wait, 2),
+            'latency': self.latency.summary(),
+        }
+
+
+class BatchClient:
+    """Async chat completions for many prompts with bounded concurrency, rate limits, retries and a response cache.
+
+    Results are dicts with the prompt, the response (None if it failed), the error, whether it
+    came from the cache, its token usage and latency. Errors are reported per prompt instead of
+    failing the whole batch.
+    """
+
+    def __init__(self, model=default_model, concurrency=8, requests_per_minute=500, tokens_per_minute=90_000,
+                 cache=cache_path, base_url=None, api_key=None, temperature=0.7, max_tokens=None,
+                 system=system_prompt, backoff=None, timeout=60):
+        self.client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY") or "unused", base_url=base_url,
+                                  timeout=timeout, max_retries=0)
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.system = system
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.requests = TokenBucket(requests_per_minute / 60, capacity=concurrency)
+        self.tokens = TokenBucket(tokens_per_minute / 60, capacity=tokens_per_minute, min_rate=tokens_per_minute / 60)
+        self.backoff = backoff or Backoff(base=1, cap=60, retries=5)
+        self.cache = ResponseCache(cache) if cache else None
+        self.stats = ChatStats()
+        self.inflight = {}
+
+    def messages(self, prompt):
+        return [{"role": "system", "content": self.system}, {"role": "user", "content": prompt}]
+
+    async def chat(self, prompt):
+        """Answers one prompt from the cache or the API. Identical prompts already in flight share one request."""
+        self.stats.counts['prompts'] += 1
+        messages = self.messages(prompt)
+        key = prompt_key(self.model, messages, self.temperature, self.max_tokens)
+        cached = self.cache and self.cache.get(key)
+        if cached:
+            self.stats.counts['cache_hits'] += 1
+            self.stats.counts['cached_tokens_saved'] += (cached[1] or 0) + (cached[2] or 0)
+            return {'prompt': prompt, 'response': cached[0], 'error': None, 'cached': True,
+                    'prompt_tokens': cached[1], 'completion_tokens': cached[2], 'seconds': 0}
+        if key not in self.inflight:
+            self.inflight[key] = asyncio.ensure_future(self.request(key, messages))
+            self.inflight[key].add_done_callback(lambda _: self.inflight.pop(key, None))
+        return {'prompt': prompt, **await asyncio.shield(self.inflight[key])}
+
+    async def request(self, key, messages):
+        estimate = estimate_tokens(messages, self.max_tokens)
+        attempt = 0
+        async with self.semaphore:
+            while True:
+                self.stats.rate_limit_wait += await self.requests.acquire_async()
+                self.stats.rate_limit_wait += await self.tokens.acquire_async(estimate)
+                started = time.monotonic()
+                try:
+                    response = await self.client.chat.completions.create(
+                        model=self.model, messages=messages, temperature=self.temperature, max_tokens=self.max_tokens)
+                except Exception as e:
+                    self.tokens.reserve(-estimate)
+                    if not retryable(e) or attempt >= self.backoff.retries:
+                        self.stats.counts['failures'] += 1
+                        return {'response': None, 'error': f"{type(e).__name__}: {e}", 'cached': False,
+                                'prompt_tokens': None, 'completion_tokens': None, 'seconds': round(time.monotonic() - started, 3)}
+                    self.stats.counts['retries'] += 1
+                    if getattr(e, 'status_code', None) == 429:
+                        self.requests.slow_down()
+                    await asyncio.sleep(self.backoff.delay(attempt))
+                    attempt += 1
+                    continue
+
+                seconds = time.monotonic() - started
+                self.stats.latency.record(seconds)
+                self.stats.counts['requests'] += 1
+                self.requests.speed_up()
+                text = response.choices[0].message.content if response.choices else None
+                usage = response.usage
+                prompt_tokens = usage.prompt_tokens if usage else None
+                completion_tokens = usage.completion_tokens if usage else None
+                if usage:
+                    # Settle the reservation with what the request really used
+                    self.tokens.reserve(usage.total_tokens - estimate)
+                    self.stats.counts['prompt_tokens'] += prompt_tokens
+                    self.stats.counts['completion_tokens'] += completion_tokens
+                if text is None:
+                    # An answer without a message fails this prompt only, and is not cached so it is asked again next run
+                    self.stats.counts['failures'] += 1
+                    return {'response': None, 'error': "EmptyResponse: the API returned no message content", 'cached': False,
+                            'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'seconds': round(seconds, 3)}
+                if self.cache:
+                    self.cache.put(key, self.model, text, prompt_tokens, completion_tokens)
+                return {'response': text, 'error': None, 'cached': False, 'prompt_tokens': prompt_tokens,
+                        'completion_tokens': completion_tokens, 'seconds': round(seconds, 3)}
+
+    async def chat_many(self, prompts, on_result=None):
+        """Answers every prompt and returns the results in the order of the prompts."""
+        async def answer(prompt):
+            result = await self.chat(prompt)
+            if on_result:
+                on_result(result)
+            return result
+        return await asyncio.gather(*(answer(prompt) for prompt in prompts))
+
+    async def close(self):
+        await self.client.close()
+        if self.cache:
+            self.cache.close()
+
+
+def chat_batch(prompts, on_result=None, **options):
+    """Runs a batch from synchronous code and returns (results, stats summary). Options go to BatchClient."""
+    async def run():
+        batch = BatchClient(**options)
+        try:
+            return await batch.chat_many(prompts, on_result), batch.stats.summary()
+        finally:
+            await batch.close()
+    return asyncio.run(run())
+
+
+def parcel_prompt(row):
+    """A request for a short narrative summary of one parcel of the scraper output."""
+    facts = {key: value for key, value in row.items() if value == value and value not in (None, "")}
+    return ("Write a two-sentence summary of this residential property for a home buyer, "
+            f"mentioning its size, age and price history: {json.dumps(facts, default=str)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a batch of prompts to an OpenAI-compatible chat API.")
+    parser.add_argument("prompts", nargs="?", help="text file with one prompt per line")
+    parser.add_argument("--parcels", help="scraper output to write a summary prompt for every parcel of")
+    parser.add_argument("--output", default="responses.jsonl", help="JSON lines file of results, in prompt order")
+    parser.add_argument("--model", default=default_model)
+    parser.add_argument("--base-url", help="API base URL, such as a local mock server")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once")
+    parser.add_argument("--rpm", type=float, default=500, help="requests per minute")
+    parser.add_argument("--tpm", type=float, default=90_000, help="tokens per minute")
+    parser.add_argument("--max-tokens", type=int, help="completion tokens per response")
+    parser.add_argument("--cache", default=cache_path, help="SQLite response cache")
+    parser.add_argument("--no-cache", action="store_true", help="always call the API")
+    args = parser.parse_args()
+
+    if args.parcels:
+        import pandas as pd
+        prompts = [parcel_prompt(row) for row in pd.read_csv(args.parcels).to_dict('records')]
+    elif args.prompts:
+        with open(args.prompts) as file:
+            prompts = [line.strip() for line in file if line.strip()]
+    else:
+        # Test the function
+        print(chat_with_gpt("What is the largest animal on Earth?"))
+        return
+
+    done = []
+
+    def progress(result):
+        done.append(result)
+        if len(done) % 100 == 0:
+            print(f"{len(done):,}/{len(prompts):,} prompts answered")
+
+    results, stats = chat_batch(prompts, progress, model=args.model, concurrency=args.concurrency,
+                                requests_per_minute=args.rpm, tokens_per_minute=args.tpm, max_tokens=args.max_tokens,
+                                cache=None if args.no_cache else args.cache, base_url=args.base_url)
+    with atomic_write(args.output) as file:
+        file.writelines(json.dumps(result) + "\n" for result in results)
+    print(f"Wrote {len(results):,} results to {args.output}")
+    print(json.dumps(stats, indent=2))
+
+
 if __name__ == "__main__":
-    prompt = "What is the largest animal on Earth?"
-    print(chat_with_gpt(prompt))
+    main()
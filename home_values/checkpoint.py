@@ -0,0 +1,95 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class CheckpointStore:
+    """Durable SQLite record of every parcel the scraper has fetched, keyed by detail page URL.
+
+    A parcel is skipped on later runs once it is marked done, unless it is older than the
+    `max_age` (in seconds) given to needs_fetch, which is how incremental re-crawls work.
+    """
+
+    def __init__(self, path="checkpoint.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS parcels (
+                url TEXT PRIMARY KEY,
+                address TEXT,
+                status TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                fetched_at REAL,
+                row TEXT,
+                error TEXT
+            )""")
+
+    def needs_fetch(self, url, max_age=None):
+        with self.lock:
+            found = self.db.execute("SELECT status, fetched_at FROM parcels WHERE url = ?", (url,)).fetchone()
+        if found is None or found[0] == "failed":
+            return True
+        return max_age is not None and time.time() - found[1] > max_age
+
+    def save(self, url, status, address=None, row=None, error=None):
+        now = time.time()
+        with self.lock:
+            self.db.execute("""
+                INSERT INTO parcels (url, address, status, first_seen, fetched_at, row, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    address = COALESCE(excluded.address, address), status = excluded.status,
+                    fetched_at = excluded.fetched_at, error = excluded.error,
+                    row = CASE WHEN excluded.status = 'failed' THEN row ELSE excluded.row END
+                """, (url, address, status, now, now, row and json.dumps(row), error))
+
+    def mark_done(self, url, row):
+        self.save(url, "done", address=row['address'], row=row)
+
+    def mark_duplicate(self, url):
+        """Records a URL whose address was already scraped through another link."""
+        self.save(url, "duplicate")
+
+    def mark_failed(self, url, error):
+        self.save(url, "failed", error=str(error))
+
+    def records(self):
+        """Yields (row, fetched_at) for every scraped row, in the order the URLs were first seen."""
+        with self.lock:
+            found = self.db.execute("SELECT row, fetched_at FROM parcels WHERE row IS NOT NULL ORDER BY first_seen, url").fetchall()
+        for data, fetched_at in found:
+            row = json.loads(data)
+            row['market_values'] = {int(year): value for year, value in row['market_values'].items()}
+            row['sales_prices'] = {int(year): price for year, price in row['sales_prices'].items()}
+            yield row, fetched_at
+
+    def rows(self):
+        """Returns the freshest row for every address, in the order the addresses were first seen."""
+        return freshest(self.records())
+
+    def close(self):
+        self.db.close()
+
+
+def freshest(records):
+    """Keeps the most recently fetched row of every address from (row, fetched_at) pairs."""
+    rows = {}
+    fetched = {}
+    for row, fetched_at in records:
+        if fetched_at >= fetched.get(row['address'], 0):
+            rows[row['address']] = row
+            fetched[row['address']] = fetched_at
+    return list(rows.values())
+
+
+def merge_rows(paths):
+    """Merges the checkpoint stores written by several workers or machines into one deduplicated list of rows."""
+    stores = [CheckpointStore(path) for path in paths]
+    try:
+        return freshest(record for store in stores for record in store.records())
+    finally:
+        for store in stores:
+            store.close()
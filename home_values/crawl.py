@@ -0,0 +1,141 @@
+"""Sharded crawl of the whole county, spread over worker processes or machines through a SQLite shard queue.
+
+    python -m home_values.crawl seed --split 1 "1%%% Oso Ave" "%%%% Hangar Dr"
+    python -m home_values.crawl run --processes 4 --backend http     # local workers, then writes the output
+    python -m home_values.crawl work --backend http                   # one worker, e.g. on another machine
+    python -m home_values.crawl status
+    python -m home_values.crawl merge checkpoint-a.db checkpoint-b.db --output output.csv
+"""
+from home_values.checkpoint import CheckpointStore, merge_rows
+from home_values.planner import expand_shards
+from home_values.playwright_scraper import addresses
+from home_values.scraper import (add_backend_arguments, backend_for, finish_metrics, make_cache, make_planner, max_age_seconds,
+                                  record_delta, start_metrics)
+from home_values.sinks import write_rows
+from home_values.work_queue import Heartbeat, ShardQueue, worker_name
+import argparse
+import copy
+import multiprocessing
+import time
+
+
+def crawl_shard(args, shard, checkpoint, metrics, planner, cache):
+    """Scrapes one shard with the chosen backend and returns how many new parcels it found."""
+    scraped = []
+    shard_args = copy.copy(args)
+    shard_args.addresses = [shard]
+    # Links are only deduplicated within a shard, so a shard leased again is scraped in full
+    planner.seen.clear()
+    failed = backend_for(args)(shard_args, scraped.append, checkpoint, max_age_seconds(args), metrics, planner, cache)
+    if failed:
+        raise RuntimeError(f"search failed for {shard}")
+    return len(scraped)
+
+
+def work(args, worker=None):
+    """Leases shards until the queue is drained, keeping each lease alive while its shard is scraped.
+
+    A worker that runs out of pending shards keeps polling while other workers hold leases,
+    so shards left behind by a worker that died are picked up once their lease expires. The
+    page cache and the search planner are opened once and shared by all of the worker's shards.
+    """
+    worker = worker or worker_name()
+    queue = ShardQueue(args.queue, args.lease, args.max_attempts)
+    checkpoint = CheckpointStore(args.checkpoint)
+    planner = make_planner(args)
+    cache = make_cache(args)
+    metrics = start_metrics(args, f"-{worker}")
+    try:
+        while True:
+            shard = queue.lease(worker)
+            if shard is None:
+                if not queue.unfinished():
+                    break
+                time.sleep(args.poll)
+                continue
+
+            print(f"[{worker}] Leased {shard}")
+            try:
+                with Heartbeat(queue, shard, worker):
+                    with metrics.time('shard'):
+                        parcels = crawl_shard(args, shard, checkpoint, metrics, planner, cache)
+            except Exception as e:
+                print(f"[{worker}] Error encountered while trying to crawl {shard}: {e}")
+                metrics.count('shard_failures')
+                queue.fail(shard, worker, e)
+                continue
+            queue.complete(shard, worker, parcels)
+            print(f"[{worker}] Finished {shard}: {parcels} new parcels")
+    finally:
+        checkpoint.close()
+        queue.close()
+        if cache:
+            cache.close()
+        finish_metrics(args, metrics, f"-{worker}")
+
+
+def seed(args):
+    queue = ShardQueue(args.queue, args.lease, args.max_attempts)
+    added = queue.add(expand_shards(args.addresses, args.split))
+    if args.retry_failed:
+        added += queue.retry_failed()
+    print(f"Queued {added} shards: {queue.counts()}")
+    queue.close()
+
+
+def run(args):
+    """Seeds the queue, works it with local processes sharing the rate budget, then writes the output."""
+    seed(args)
+    worker_args = copy.copy(args)
+    worker_args.rps = args.rps / args.processes
+    worker_args.metrics_port = None
+    processes = [multiprocessing.Process(target=work, args=(worker_args, f"{worker_name()}-{number}"))
+                 for number in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    status(args)
+    export(args, [args.checkpoint])
+
+
+def status(args):
+    queue = ShardQueue(args.queue, args.lease, args.max_attempts)
+    print(f"Shards: {queue.counts()}")
+    for shard, error in queue.db.execute("SELECT shard, error FROM shards WHERE status = 'failed'"):
+        print(f"  failed {shard}: {error}")
+    queue.close()
+
+
+def export(args, checkpoints):
+    """Writes one deduplicated output from the checkpoint stores, keeping the freshest row of every address."""
+    rows = merge_rows(checkpoints)
+    write_rows(rows, args.output, args.batch_size)
+    print(f"Wrote {len(rows)} parcels to {args.output}")
+    record_delta(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl address shards from a shared work queue.")
+    parser.add_argument("command", choices=["seed", "run", "work", "status", "merge"])
+    add_backend_arguments(parser)
+    parser.add_argument("--queue", default="queue.db", help="SQLite shard queue, on a filesystem shared by all workers")
+    parser.add_argument("--split", type=int, default=0, help="seed: split every address pattern on its first '%%' this many times")
+    parser.add_argument("--retry-failed", action="store_true", help="seed: queue failed shards again")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(), help="run: local worker processes")
+    parser.add_argument("--lease", type=float, default=300, help="seconds a shard stays leased without a heartbeat")
+    parser.add_argument("--max-attempts", type=int, default=3, help="leases of a shard before it is marked failed")
+    parser.add_argument("--poll", type=float, default=10, help="seconds between polls while other workers hold shards")
+    parser.add_argument("addresses", nargs="*", help="seed/run: address patterns; merge: checkpoint files")
+    args = parser.parse_intermixed_args()
+
+    if args.command == "merge":
+        export(args, args.addresses or [args.checkpoint])
+        return
+    if args.command in ("seed", "run") and not args.addresses:
+        args.addresses = addresses
+    {'seed': seed, 'run': run, 'work': work, 'status': status}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
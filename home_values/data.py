@@ -0,0 +1,208 @@
+from home_values.atomic import discard, is_partial, partial_path
+from home_values.sinks import long_tables
+import ast
+import hashlib
+import os
+import shutil
+import pandas as pd
+
+# Parsed tables are cached here, one directory per output path and in it one per version of the output
+cache_dir = ".data_cache"
+
+# The scraper keeps the snapshot of its last output and the deltas since here
+delta_dir = ".deltas"
+
+# Bump when the cached table layout changes so stale caches are rebuilt
+cache_format = 1
+
+tables = ('properties', 'market_values', 'sales')
+
+# Parcels the dashboard has always left out; every model, leaderboard, batch score and chart drops them too
+excluded_addresses = ['900 HANGAR DR', '934 HANGAR DR']
+
+
+def companion_paths(path):
+    stem, extension = os.path.splitext(path)
+    return {'market_values': f"{stem}_market_values{extension}", 'sales': f"{stem}_sales{extension}"}
+
+
+def source_id(path):
+    """Identifies an output path, so outputs sharing a cache directory never touch each other's tables."""
+    return hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+
+
+def source_version(path):
+    """Identifies a version of the scraper output by the size and modification time of its files."""
+    digest = hashlib.sha1(f"{cache_format}:{os.path.abspath(path)}".encode())
+    for source in [path, *companion_paths(path).values()]:
+        if os.path.exists(source):
+            stat = os.stat(source)
+            digest.update(f"{source}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def content_hash(df, salt=""):
+    """A short hash of the values of df, ignoring its index, salted with anything else the result depends on."""
+    digest = hashlib.sha256(salt.encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def read_table(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        return pd.read_parquet(path)
+    if extension == ".jsonl":
+        return pd.read_json(path, lines=True, dtype=False)
+    return pd.read_csv(path)
+
+
+def parse_history(value):
+    return ast.literal_eval(value) if isinstance(value, str) else (value if isinstance(value, dict) else {})
+
+
+def build_dataset(path="output.csv"):
+    """Parses scraper output into a properties table and long market_values / sales tables.
+
+    When the scraper wrote long tables next to the output they are read directly; older
+    files are converted by evaluating their dict columns once.
+    """
+    properties = read_table(path)
+    companions = companion_paths(path)
+    if all(os.path.exists(companion) for companion in companions.values()):
+        history = {name: read_table(companion) for name, companion in companions.items()}
+    else:
+        rows = pd.DataFrame({
+            'address': properties['address'],
+            'market_values': properties['market_values'].map(parse_history),
+            'sales_prices': properties['sales_prices'].map(parse_history),
+        }).to_dict('records')
+        long = long_tables(rows)
+        history = {
+            'market_values': pd.DataFrame(long['market_values'], columns=['address', 'year', 'value', 'seq']),
+            'sales': pd.DataFrame(long['sales'], columns=['address', 'year', 'price', 'seq']),
+        }
+
+    properties = properties.drop(columns=['market_values', 'sales_prices'], errors='ignore').reset_index(drop=True)
+    market_values = history['market_values'].astype({'year': 'int32', 'value': 'int64', 'seq': 'int16'})
+    sales = history['sales'].astype({'year': 'int32', 'price': 'int64', 'seq': 'int16'})
+    return {'properties': properties, 'market_values': market_values.reset_index(drop=True), 'sales': sales.reset_index(drop=True)}
+
+
+def load_dataset(path="output.csv", cache=cache_dir, deltas=delta_dir):
+    """Returns the parsed dataset for path, building and caching it as Feather files on first use.
+
+    Later loads memory-map the cached Feather files instead of parsing the output again.
+    The returned dict also carries a 'version' key that changes whenever the output does.
+    """
+    import pyarrow.feather as feather
+
+    version = source_version(path)
+    versions = os.path.join(cache, source_id(path))
+    directory = os.path.join(versions, version)
+    if not os.path.isdir(directory):
+        dataset = replay_deltas(versions, version, deltas) or build_dataset(path)
+        temporary = partial_path(directory)
+        os.makedirs(temporary)
+        for name in tables:
+            feather.write_feather(dataset[name], os.path.join(temporary, f"{name}.feather"))
+        try:
+            os.replace(temporary, directory)
+        except OSError:
+            # Another loader cached the same version first; its tables are as good as ours
+            if not os.path.isdir(directory):
+                raise
+            discard(temporary)
+
+        # Older versions of this output are never read again
+        for stale in os.listdir(versions):
+            if stale != version and not is_partial(stale):
+                shutil.rmtree(os.path.join(versions, stale), ignore_errors=True)
+
+    dataset = {name: feather.read_table(os.path.join(directory, f"{name}.feather"), memory_map=True).to_pandas() for name in tables}
+    dataset['version'] = version
+    return dataset
+
+
+def replay_deltas(versions, version, deltas=delta_dir):
+    """The tables of `version` from an older cached version plus the scrape deltas since, or None if there is no such chain."""
+    import pyarrow.feather as feather
+    from home_values.diff import replay
+
+    if not os.path.isdir(versions):
+        return None
+    for cached in os.listdir(versions):
+        if not is_partial(cached) and os.path.isdir(os.path.join(versions, cached)):
+            tables_dir = os.path.join(versions, cached)
+            dataset = {name: feather.read_table(os.path.join(tables_dir, f"{name}.feather")).to_pandas() for name in tables}
+            dataset = replay(dataset, cached, version, deltas)
+            if dataset is not None:
+                return dataset
+    return None
+
+
+def most_recent(history, column):
+    """Maps each address to the value of its most recent (seq 0) history entry."""
+    latest = history[history['seq'] == 0].drop_duplicates('address')
+    return latest.set_index('address')[column]
+
+
+def derive_features(dataset):
+    """Adds the most recent sale and market value plus the model features to the properties table, without the excluded addresses."""
+    df = dataset['properties']
+    df = df[~df['address'].isin(excluded_addresses)].copy()
+    df['most_recent_sales_year'] = df['address'].map(most_recent(dataset['sales'], 'year'))
+    df['most_recent_sales_price'] = df['address'].map(most_recent(dataset['sales'], 'price'))
+    df['most_recent_market_value'] = df['address'].map(most_recent(dataset['market_values'], 'value'))
+
+    df = model_features(df)
+    df['price_per_sqft'] = (df['most_recent_sales_price'] / df['total_sqft']).where(df['total_sqft'] > 0)
+    return df
+
+
+def model_features(df):
+    """Adds total_sqft (square_feet + unfin_attic_sqft + garage_apt_sqft), has_garage and has_apt to a properties table."""
+    df['total_sqft'] = df['square_feet'].fillna(0) + df['unfin_attic_sqft'].fillna(0) + df['garage_apt_sqft'].fillna(0)
+    df['has_garage'] = (df['garage_sqft'] > 0).astype(int)
+    df['has_apt'] = (df['garage_apt_sqft'] > 0).astype(int)
+    return df
+
+
+def sales_frame(df, sales):
+    """Joins every sale of the properties in df onto its total square footage and price per square foot.
+
+    Properties without square footage or a sale are left out, as they have not been finished or sold.
+    """
+    sold = df.dropna(subset=['square_feet', 'most_recent_sales_price'])
+    df_sales = sales.merge(sold[['address', 'total_sqft']], on='address')
+    df_sales = df_sales.rename(columns={'price': 'sales_price'})[['address', 'total_sqft', 'year', 'sales_price']]
+    df_sales['price_per_sqft'] = (df_sales['sales_price'] / df_sales['total_sqft']).where(df_sales['total_sqft'] > 0, 0)
+    return df_sales
+
+
+def split_sales(df_sales):
+    """Splits a sales frame into the initial (oldest) sale of every address and all later resales."""
+    first = ~df_sales.sort_values(by='year', kind='stable').duplicated('address')
+    initial = first.reindex(df_sales.index)
+    return df_sales[initial].sort_values(by='year', kind='stable'), df_sales[~initial]
+
+
+def filter_properties(df, min_sqft, max_sqft, min_beds, max_beds, min_baths, min_year, max_year, has_garage="Any"):
+    """Applies the Property Explorer filters. has_garage is "Any", "Yes" or "No"."""
+    mask = (df['total_sqft'].between(min_sqft, max_sqft) & df['bedrooms'].between(min_beds, max_beds)
+            & (df['bathrooms'] >= min_baths) & df['year_built'].between(min_year, max_year))
+    if has_garage == "Yes":
+        mask &= df['has_garage'] == 1
+    elif has_garage == "No":
+        mask &= df['has_garage'] == 0
+    return df[mask]
+
+
+def yearly_stats(df_sales):
+    """Sales count, mean and median price and mean price/sqft for every year."""
+    yearly = df_sales.groupby('year').agg({
+        'sales_price': ['count', 'mean', 'median'],
+        'price_per_sqft': 'mean'
+    }).round(0)
+    yearly.columns = ['# Sales', 'Avg Price', 'Median Price', 'Avg $/SqFt']
+    return yearly
@@ -0,0 +1,302 @@
+"""Change data capture between scraper runs: per-address deltas of the output, and replaying them onto a cached dataset.
+
+    python -m home_values.diff output.csv
+
+After every scrape the new output is compared by address with a snapshot of the previous one.
+Each row and each field is hashed, and only the addresses whose hashes differ are compared value
+by value. The result is a compact JSON lines delta in .deltas/<previous version>-<version>.jsonl.
+It holds the new parcels, the removed ones, the changed fields, the new or changed sales_prices
+and market_values years, and the years that dropped off a history. load_dataset replays the
+deltas onto its cached tables instead of parsing the whole output again.
+"""
+from home_values.atomic import atomic_path, atomic_write
+from home_values.data import build_dataset, delta_dir, source_version
+from home_values.sinks import property_columns
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+
+# Bump when the delta records change shape; older deltas are then ignored and the output is parsed again
+delta_format = 1
+
+# Delta files kept for dashboards that fell behind by several scrapes
+keep_deltas = 30
+
+fields = [column for column in property_columns if column != 'address']
+
+# Long history table -> (value column, key of the scraped row's dict column)
+histories = {'market_values': ('value', 'market_values'), 'sales': ('price', 'sales_prices')}
+
+
+def plain(value):
+    """A JSON-ready Python value for a table cell, None for missing."""
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def history_dicts(table, column, addresses):
+    """{address: {year: value}} for the addresses given, from a long history table."""
+    selected = table[table['address'].isin(addresses)]
+    result = {address: {} for address in addresses}
+    for address, year, value in zip(selected['address'], selected['year'], selected[column]):
+        result[address][int(year)] = plain(value)
+    return result
+
+
+def canonical(values):
+    """The values of a column in a form that hashes the same whatever dtype it was read with.
+
+    Numbers become float64, so a column read as int64 in one scrape and float64 (because of a
+    missing value) in the next does not look changed; anything else becomes a string.
+    """
+    numbers = pd.to_numeric(values, errors='coerce')
+    if (numbers.notna() == values.notna()).all():
+        return numbers.to_numpy(dtype='float64', na_value=np.nan)
+    return values.astype(object).where(values.notna(), None).astype(str).to_numpy(dtype=object)
+
+
+def cast_like(values, dtype):
+    """values cast to a table column's dtype, or to the dtype a full parse would give them when they do not fit it.
+
+    A missing or fractional number in an int column makes it float64, as it does when pandas
+    reads the output; a missing flag or a string among numbers makes the column object.
+    """
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        try:
+            cast = values.astype(dtype)
+            if values.notna().all() and (cast == values).all():
+                return cast
+        except (TypeError, ValueError):
+            pass
+        if pd.api.types.is_bool_dtype(dtype):
+            return values.astype(object)
+        try:
+            return values.astype('float64')
+        except (TypeError, ValueError):
+            return values.astype(object)
+    return values.astype(dtype)
+
+
+def field_hashes(dataset):
+    """A hash of every property field and of both histories, plus one of the whole row, indexed by address."""
+    properties = dataset['properties'].drop_duplicates('address', keep='last')
+    index = pd.Index(properties['address'].to_numpy(dtype=object))
+    hashes = pd.DataFrame({field: pd.util.hash_array(canonical(properties[field])) for field in fields}, index=index)
+    for name, (column, _) in histories.items():
+        table = dataset[name]
+        codes, addresses = pd.factorize(table['address'].to_numpy(dtype=object))
+        # Summing the entry hashes (wrapping around) makes the history hash independent of row order
+        sums = np.zeros(len(addresses), dtype='uint64')
+        np.add.at(sums, codes, pd.util.hash_pandas_object(table[['year', column]], index=False).to_numpy())
+        hashes[name] = pd.Series(sums, index=addresses).reindex(index, fill_value=0).to_numpy()
+    hashes['row'] = pd.util.hash_pandas_object(hashes, index=False).to_numpy()
+    return hashes
+
+
+def diff_datasets(old, new):
+    """Returns the delta records that turn the old dataset into the new one, one per changed address."""
+    before, after = field_hashes(old), field_hashes(new)
+    added = after.index.difference(before.index)
+    removed = before.index.difference(after.index)
+    common = after.index.intersection(before.index)
+    changed = common[after['row'].reindex(common).to_numpy() != before['row'].reindex(common).to_numpy()]
+
+    records = []
+    properties = new['properties'].drop_duplicates('address', keep='last')
+    properties = properties[properties['address'].isin(added.union(changed))].set_index('address')[fields].to_dict('index')
+    new_histories = {name: history_dicts(new[name], column, added.union(changed)) for name, (column, _) in histories.items()}
+    old_histories = {name: history_dicts(old[name], column, changed) for name, (column, _) in histories.items()}
+
+    for address in added:
+        record = {'address': address, 'op': 'add', 'fields': {field: plain(value) for field, value in properties[address].items()}}
+        for name, (_, key) in histories.items():
+            record[key] = new_histories[name][address]
+        records.append(record)
+
+    # Only the fields whose hashes differ are compared and written
+    differs = after.loc[changed, fields] != before.loc[changed, fields]
+    for address, field_changes in zip(changed, differs.to_numpy()):
+        record = {'address': address, 'op': 'update'}
+        changed_fields = [field for field, change in zip(fields, field_changes) if change]
+        if changed_fields:
+            record['fields'] = {field: plain(properties[address][field]) for field in changed_fields}
+        for name, (_, key) in histories.items():
+            previous, current = old_histories[name][address], new_histories[name][address]
+            updates = {year: value for year, value in current.items() if previous.get(year) != value}
+            if updates:
+                record[key] = updates
+            dropped = sorted(set(previous) - set(current))
+            if dropped:
+                record[f"removed_{key}"] = dropped
+        records.append(record)
+
+    records.extend({'address': address, 'op': 'remove'} for address in removed)
+    return records
+
+
+def write_delta(records, base, version, directory=delta_dir):
+    """Writes a header line and the records to <directory>/<base>-<version>.jsonl and returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{base}-{version}.jsonl")
+    counts = {op: sum(record['op'] == op for record in records) for op in ('add', 'update', 'remove')}
+    header = {'format': delta_format, 'base': base, 'version': version,
+              'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'counts': counts}
+    with atomic_write(path) as file:
+        file.write(json.dumps(header) + "\n")
+        file.writelines(json.dumps(record) + "\n" for record in records)
+
+    # Deltas older than the newest keep_deltas are no longer needed to catch a cache up
+    for stale in sorted(glob.glob(os.path.join(directory, "*.jsonl")), key=os.path.getmtime)[:-keep_deltas]:
+        os.remove(stale)
+    return path
+
+
+def read_delta(path):
+    """Returns (header, records) of a delta file. JSON object keys are strings, so history years are turned back into ints."""
+    with open(path) as file:
+        header = json.loads(file.readline())
+        records = [json.loads(line) for line in file]
+    for record in records:
+        for key in ('market_values', 'sales_prices'):
+            if key in record:
+                record[key] = {int(year): value for year, value in record[key].items()}
+    return header, records
+
+
+def apply_delta(dataset, records):
+    """Returns the properties, market_values and sales tables with the delta records applied.
+
+    Only the rows of the addresses in the records are rebuilt. Their history `seq` is renumbered
+    from the most recent year, the order the assessor pages list them in.
+    """
+    touched = [record['address'] for record in records]
+    properties = dataset['properties']
+    selected = properties['address'].isin(touched)
+    current = properties[selected].set_index('address')[fields].to_dict('index')
+
+    rows = []
+    for record in records:
+        if record['op'] == 'remove':
+            continue
+        row = {} if record['op'] == 'add' else current[record['address']]
+        row.update(record.get('fields', {}))
+        rows.append({'address': record['address'], **row})
+    updated = pd.DataFrame(rows, columns=['address', *fields])
+    updated = pd.DataFrame({column: cast_like(updated[column], properties[column].dtype) for column in updated.columns})
+    properties = pd.concat([properties[~selected], updated], ignore_index=True)
+
+    tables = {'properties': properties}
+    for name, (column, key) in histories.items():
+        table = dataset[name]
+        selected = table['address'].isin(touched)
+        previous = history_dicts(table[selected], column, touched)
+        entries = []
+        for record in records:
+            if record['op'] == 'remove':
+                continue
+            history = {} if record['op'] == 'add' else previous[record['address']]
+            history.update(record.get(key, {}))
+            for year in record.get(f"removed_{key}", []):
+                history.pop(year, None)
+            for seq, year in enumerate(sorted(history, reverse=True)):
+                entries.append({'address': record['address'], 'year': year, column: history[year], 'seq': seq})
+        rebuilt = pd.DataFrame(entries, columns=['address', 'year', column, 'seq']).astype(table.dtypes.to_dict())
+        tables[name] = pd.concat([table[~selected], rebuilt], ignore_index=True)
+    return tables
+
+
+def delta_chain(base, version, directory=delta_dir):
+    """Paths of the deltas leading from one version to another, or None if a link is missing."""
+    links = {}
+    for path in glob.glob(os.path.join(directory, "*-*.jsonl")):
+        start, end = os.path.basename(path)[:-len(".jsonl")].split("-", 1)
+        links[start] = (end, path)
+    chain = []
+    while base != version:
+        if base not in links or len(chain) > keep_deltas:
+            return None
+        base, path = links[base]
+        chain.append(path)
+    return chain
+
+
+def replay(dataset, base, version, directory=delta_dir):
+    """The dataset of `version`, built by applying the deltas since `base`, or None if they are not all there."""
+    chain = delta_chain(base, version, directory)
+    if chain is None:
+        return None
+    for path in chain:
+        header, records = read_delta(path)
+        if header.get('format') != delta_format:
+            return None
+        dataset = apply_delta(dataset, records)
+    return dataset
+
+
+def load_snapshot(directory=delta_dir):
+    """The tables and version of the last scrape recorded, or (None, None)."""
+    import pyarrow.feather as feather
+
+    snapshot = os.path.join(directory, "snapshot")
+    try:
+        with open(os.path.join(snapshot, "version")) as file:
+            version = file.read().strip()
+    except FileNotFoundError:
+        return None, None
+    return {name: feather.read_table(os.path.join(snapshot, f"{name}.feather")).to_pandas()
+            for name in ('properties', 'market_values', 'sales')}, version
+
+
+def save_snapshot(dataset, version, directory=delta_dir):
+    import pyarrow.feather as feather
+
+    snapshot = os.path.join(directory, "snapshot")
+    with atomic_path(snapshot) as temporary:
+        os.makedirs(temporary)
+        for name in ('properties', 'market_values', 'sales'):
+            feather.write_feather(dataset[name], os.path.join(temporary, f"{name}.feather"))
+        with open(os.path.join(temporary, "version"), 'w') as file:
+            file.write(version)
+        shutil.rmtree(snapshot, ignore_errors=True)
+
+
+def record_scrape(path="output.csv", directory=delta_dir):
+    """Diffs a freshly written output against the previous snapshot, writes the delta and makes the output the new snapshot.
+
+    Returns the header of the delta written, or None for the first scrape or an unchanged output.
+    """
+    version = source_version(path)
+    previous, base = load_snapshot(directory)
+    if base == version:
+        return None
+    dataset = build_dataset(path)
+    header = None
+    if previous is not None:
+        records = diff_datasets(previous, dataset)
+        header, _ = read_delta(write_delta(records, base, version, directory))
+    save_snapshot(dataset, version, directory)
+    return header
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record the changes in a scraper output since the previous scrape.")
+    parser.add_argument("output", nargs="?", default="output.csv", help="scraper output just written")
+    parser.add_argument("--directory", default=delta_dir, help="where the snapshot and the deltas are kept")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    header = record_scrape(args.output, args.directory)
+    if header is None:
+        print(f"No delta written: {args.output} is the first scrape recorded or has not changed")
+    else:
+        print(f"Delta {header['base']} -> {header['version']}: {header['counts']} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from functools import lru_cache
+import numpy as np
+
+# Columns shown in the Property Explorer table and their headers
+display_columns = {
+    'address': 'Address',
+    'total_sqft': 'Total Sq Ft',
+    'bedrooms': 'Beds',
+    'bathrooms': 'Baths',
+    'year_built': 'Year Built',
+    'most_recent_sales_price': 'Last Sale Price',
+    'most_recent_market_value': 'Market Value',
+    'garage_sqft': 'Garage Sq Ft',
+}
+
+currency_columns = ['Last Sale Price', 'Market Value']
+
+# Columns the explorer filters on a range of
+range_columns = ['total_sqft', 'bedrooms', 'bathrooms', 'year_built']
+
+
+def format_currency(values):
+    return values.map("${:,.0f}".format, na_action='ignore').fillna("N/A")
+
+
+class PropertyIndex:
+    """Answers Property Explorer queries from sorted indexes built once per dataset.
+
+    Every range column is kept sorted next to its row positions, so the narrowest range is
+    found with two binary searches and only its rows are checked against the other filters.
+    Garage ownership is a boolean bitmap. Nothing is copied per query, the formatted display
+    table is built once, and only the requested page of it is materialized.
+    """
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.values = {column: self.df[column].to_numpy(dtype=float) for column in range_columns}
+        self.order = {column: np.argsort(values, kind='stable') for column, values in self.values.items()}
+        self.sorted = {column: self.values[column][order] for column, order in self.order.items()}
+        self.has_garage = self.df['has_garage'].to_numpy() == 1
+
+        display = self.df[list(display_columns)].rename(columns=display_columns)
+        for column in currency_columns:
+            display[column] = format_currency(display[column])
+        self.display = display
+
+        # Repeated widget states (such as switching pages) reuse the matching rows
+        self.query = lru_cache(maxsize=64)(self.positions)
+
+    def range_positions(self, column, low, high):
+        """Row positions whose value lies in [low, high], in sorted order of the column."""
+        start = np.searchsorted(self.sorted[column], low, side='left')
+        end = np.searchsorted(self.sorted[column], high, side='right')
+        return self.order[column][start:end]
+
+    def positions(self, min_sqft, max_sqft, min_beds, max_beds, min_baths, min_year, max_year, has_garage="Any"):
+        """Row positions matching the filters, in the order of the properties table. Same rules as filter_properties."""
+        ranges = {
+            'total_sqft': (min_sqft, max_sqft),
+            'bedrooms': (min_beds, max_beds),
+            'bathrooms': (min_baths, np.inf),
+            'year_built': (min_year, max_year),
+        }
+
+        # Starts from the most selective range and checks the remaining filters on its rows only
+        candidates = min((self.range_positions(column, low, high) for column, (low, high) in ranges.items()), key=len)
+        keep = np.ones(len(candidates), dtype=bool)
+        for column, (low, high) in ranges.items():
+            values = self.values[column][candidates]
+            keep &= (values >= low) & (values <= high)
+        if has_garage == "Yes":
+            keep &= self.has_garage[candidates]
+        elif has_garage == "No":
+            keep &= ~self.has_garage[candidates]
+        return np.sort(candidates[keep])
+
+    def filter(self, *filters, **named):
+        """The matching rows of the properties table, like filter_properties."""
+        return self.df.iloc[self.query(*filters, **named)]
+
+    def page(self, positions, number, size=100):
+        """Formatted display rows for one page (numbered from 0) of a query's matches."""
+        return self.display.iloc[positions[number * size:(number + 1) * size]]
+
+
+def pages(positions, size=100):
+    return max(1, -(-len(positions) // size))
+
@@ -0,0 +1,133 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from home_values import parcel
+from home_values.metrics import Metrics
+from home_values.pacing import Pacer
+from home_values.planner import SearchPlanner
+from home_values.parsing import make_soup, result_links
+from home_values.playwright_scraper import search_url
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin
+import requests
+import threading
+
+
+def make_session(pool_size=4):
+    """Creates a keep-alive session whose connection pool is shared by all worker threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "Mozilla/5.0 (compatible; WheelerHomeValues/2.0)"
+    return session
+
+
+def fetch(session, pacer, method, url, cache=None, **kwargs):
+    """Fetches a page through the pacer, or serves it from the page cache without spending a request."""
+    if cache:
+        cached = cache.get(method, url, kwargs.get('params'), kwargs.get('data'))
+        if cached:
+            return cached
+    response = pacer.call(session.request, method, url, timeout=30, **kwargs)
+    response.raise_for_status()
+    if cache:
+        cache.put(method, url, response, kwargs.get('params'), kwargs.get('data'))
+    return response
+
+
+def search_form(html, page_url):
+    """Returns the action URL and default fields of the form holding the FormattedLocation input."""
+    soup = make_soup(html)
+    location = soup.select_one("input[name='FormattedLocation']")
+    if location is None:
+        raise LookupError("search page has no FormattedLocation input")
+    form = location.find_parent("form")
+    fields = {}
+    for field in form.select("input[name]"):
+        if field.get("type", "text").lower() not in ("reset", "button", "image", "checkbox", "radio"):
+            fields[field["name"]] = field.get("value", "")
+    return urljoin(page_url, form.get("action") or page_url), form.get("method", "get").lower(), fields
+
+
+def search(session, pacer, address_range, url=search_url, cache=None):
+    """Submits a wildcard address search and returns the detail page URLs from the result table."""
+    search_page = fetch(session, pacer, "GET", url, cache)
+    action, method, fields = search_form(search_page.text, search_page.url)
+    fields["FormattedLocation"] = address_range
+    if method == "post":
+        results = fetch(session, pacer, "POST", action, cache, data=fields)
+    else:
+        results = fetch(session, pacer, "GET", action, cache, params=fields)
+    return result_links(results.text, results.url)
+
+
+def scrape_parcel(session, pacer, url, address_list, lock, cache=None):
+    """Fetches and parses one parcel detail page and its "more detail" page into a CSV row."""
+    def load(page_url, ready_selector):
+        response = fetch(session, pacer, "GET", page_url, cache)
+        return response.text, response.url
+    return parcel.scrape_parcel(load, url, pacer.metrics, address_list, lock)
+
+
+def scrape(address_ranges, on_row, requests_per_second=0.5, url=search_url, workers=4, checkpoint=None, max_age=None,
+           planner=None, cache=None, metrics=None):
+    """Scrapes every address range over plain HTTP, without starting a browser.
+
+    Pages found in the page cache are not fetched again. Returns the address ranges whose search failed.
+    """
+    metrics = metrics or Metrics()
+    session = make_session(workers)
+    pacer = Pacer(requests_per_second, metrics=metrics)
+    planner = planner or SearchPlanner(None)
+    address_list = set()
+    lock = threading.Lock()
+    failed = []
+    pending = deque(planner.plan(address_ranges))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            while pending:
+                address_range = pending.popleft()
+                try:
+                    with metrics.time('search'):
+                        hrefs = search(session, pacer, address_range, url, cache)
+                except Exception as e:
+                    print(f"Error encountered while trying to search {address_range}: {e}")
+                    metrics.count('search_failures')
+                    failed.append(address_range)
+                    continue
+
+                # Narrower prefixes of a range with too many results are searched right after it
+                hrefs, narrower = planner.record(address_range, hrefs)
+                pending.extendleft(reversed(narrower))
+                if checkpoint:
+                    hrefs = [href for href in hrefs if checkpoint.needs_fetch(href, max_age)]
+                parcels = [executor.submit(scrape_parcel, session, pacer, href, address_list, lock, cache) for href in hrefs]
+                for href, future in zip(hrefs, parcels):
+                    try:
+                        row = future.result()
+                    except Exception as e:
+                        print(f"Error encountered while trying to scrape {href}: {e}")
+                        metrics.count('parcel_failures')
+                        if checkpoint:
+                            checkpoint.mark_failed(href, e)
+                        continue
+                    if row is None:
+                        metrics.count('duplicates')
+                        if checkpoint:
+                            checkpoint.mark_duplicate(href)
+                        continue
+                    if checkpoint:
+                        checkpoint.mark_done(href, row)
+                    metrics.count('parcels')
+                    on_row(row)
+        finally:
+            planner.save()
+
+    print("Request latency (seconds): ", pacer.stats.summary())
+    print("Search planner: ", planner.counts)
+    metrics.add_counts('planner', planner.counts)
+    if cache:
+        print("Page cache: ", cache.stats())
+        metrics.add_counts('cache', {'hits': cache.hits, 'misses': cache.misses})
+    return failed
@@ -0,0 +1,169 @@
+from home_values.atomic import atomic_write
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+# Upper bounds (seconds) of the histogram buckets, from a parsed page up to a backed-off request
+buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """Bucketed durations of one stage, cheap enough to record for every parcel."""
+
+    def __init__(self):
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, seconds):
+        position = next((index for index, bound in enumerate(buckets) if seconds <= bound), len(buckets))
+        self.counts[position] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, or the largest duration seen."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total': round(self.sum, 3),
+            'mean': round(self.sum / self.count, 4) if self.count else 0,
+            'p50': round(self.quantile(0.5), 4),
+            'p95': round(self.quantile(0.95), 4),
+            'max': round(self.max, 4),
+        }
+
+
+class Metrics:
+    """Per-stage timings and counters for a scraper run.
+
+    Stages are timed with `with metrics.time("fetch_detail"):`. Counters can carry labels,
+    like the field a parser failed on. summary() is the JSON run report and prometheus()
+    renders the same numbers in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add_counts(self, prefix, counts):
+        """Adds a dict of counts kept elsewhere, such as the search planner's, as prefixed counters."""
+        for name, value in counts.items():
+            self.count(f"{prefix}_{name}", value)
+
+    def field_errors(self, errors):
+        """Counts the (field, exception) pairs the parsers return, per field extractor."""
+        for field, _ in errors:
+            self.count('field_errors', field=field)
+
+    def total(self, name):
+        with self.lock:
+            return sum(value for (counter, _), value in self.counters.items() if counter == name)
+
+    def summary(self):
+        elapsed = time.time() - self.started
+        with self.lock:
+            stages = {stage: histogram.summary() for stage, histogram in sorted(self.stages.items())}
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                if labels:
+                    counters.setdefault(name, {})[",".join(f"{key}={label}" for key, label in labels)] = value
+                else:
+                    counters[name] = value
+        return {
+            'started': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            'elapsed_seconds': round(elapsed, 1),
+            'parcels_per_minute': round(self.total('parcels') / elapsed * 60, 2) if elapsed else 0,
+            'stages': stages,
+            'counters': counters,
+        }
+
+    def prometheus(self):
+        lines = []
+        with self.lock:
+            for stage, histogram in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f'home_values_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'home_values_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'home_values_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            for (name, labels), value in sorted(self.counters.items()):
+                rendered = ",".join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f"home_values_{name}_total{{{rendered}}} {value}" if rendered else f"home_values_{name}_total {value}")
+        lines.append(f"home_values_elapsed_seconds {time.time() - self.started}")
+        return "\n".join(["# TYPE home_values_stage_seconds histogram", *lines]) + "\n"
+
+    def write(self, path, text):
+        with atomic_write(path) as file:
+            file.write(text)
+
+    def write_summary(self, path):
+        self.write(path, json.dumps(self.summary(), indent=2))
+
+    def write_prometheus(self, path):
+        self.write(path, self.prometheus())
+
+    def export(self, prometheus_file=None, port=None, interval=15, host="127.0.0.1"):
+        """Keeps a Prometheus text file up to date and/or serves /metrics on host:port, from daemon threads.
+
+        The server only listens on the loopback interface unless another host is given. Returns the server, if any.
+        """
+        server = None
+        if port:
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = metrics.prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            print(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+
+        if prometheus_file:
+            def refresh():
+                while True:
+                    self.write_prometheus(prometheus_file)
+                    time.sleep(interval)
+            threading.Thread(target=refresh, daemon=True).start()
+        return server
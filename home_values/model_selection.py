@@ -0,0 +1,147 @@
+"""Cross-validated comparison of the candidate regression models, written to a leaderboard the dashboard reads.
+
+    python -m home_values.model_selection output.csv --folds 10 --jobs -1
+"""
+from home_values import models
+from home_values.atomic import atomic_write
+from home_values.data import delta_dir, derive_features, load_dataset
+from joblib import Memory, Parallel, delayed
+from sklearn.linear_model import ElasticNet, Lasso, LassoCV, LinearRegression, Ridge
+from sklearn.model_selection import KFold, cross_validate, train_test_split
+from sklearn.pipeline import Pipeline
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# Every metric is scored in the same cross_validate pass, so each fold is fitted once
+scoring = {'mse': 'neg_mean_squared_error', 'mae': 'neg_mean_absolute_error', 'r2': 'r2'}
+
+leaderboard_name = "leaderboard.json"
+
+
+def candidates(X_train, y_train, memory=None):
+    """The Linear, Ridge, Lasso and ElasticNet pipelines compared in analysis.ipynb.
+
+    The Lasso alpha is picked by LassoCV on the training split, as the notebook does.
+    Pipelines share `memory`, so the scaler fitted on a fold is reused by every candidate.
+    """
+    alphas = np.logspace(-4, 0, 50)
+    best_alpha = LassoCV(alphas=alphas, cv=5).fit(X_train, y_train).alpha_
+    regressors = {
+        'Linear Regression': LinearRegression(),
+        'Ridge Regression': Ridge(alpha=1.0),
+        'Lasso Regression': Lasso(alpha=best_alpha),
+        'ElasticNet Regression': ElasticNet(alpha=0.1, l1_ratio=0.5),
+    }
+    return {name: Pipeline(steps=[('preprocessor', models.make_preprocessor()), ('regressor', regressor)], memory=memory)
+            for name, regressor in regressors.items()}
+
+
+def folds(X, n_splits=10, random_state=1):
+    """Fold splits computed once and shared by every candidate."""
+    return list(KFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(X))
+
+
+def score_candidate(name, model, X, y, splits, n_jobs):
+    started = time.perf_counter()
+    scores = cross_validate(model, X, y, cv=splits, scoring=scoring, n_jobs=n_jobs)
+    return {
+        'model': name,
+        'mse': -scores['test_mse'].mean(),
+        'rmse': np.sqrt(-scores['test_mse']).mean(),
+        'mae': -scores['test_mae'].mean(),
+        'r2': scores['test_r2'].mean(),
+        'r2_std': scores['test_r2'].std(),
+        'fit_seconds': scores['fit_time'].mean(),
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def compare_models(pipelines, X, y, splits=None, n_jobs=-1):
+    """Cross-validates every pipeline and returns a leaderboard sorted by mean squared error.
+
+    Candidates run in parallel and each spreads its folds over its share of the cores,
+    so the whole comparison scales with the number of cores.
+    """
+    splits = splits if splits is not None else folds(X)
+    cores = os.cpu_count() if n_jobs in (None, -1) else n_jobs
+    outer = min(len(pipelines), cores)
+    inner = max(1, cores // outer)
+    rows = Parallel(n_jobs=outer)(delayed(score_candidate)(name, model, X, y, splits, inner) for name, model in pipelines.items())
+    return pd.DataFrame(rows).sort_values('mse').reset_index(drop=True)
+
+
+def targets(df):
+    """(X, y) for the market value model and for the sales price model (2024+ sales), like train_models."""
+    filtered_df = models.training_frame(df)
+    recent_df = filtered_df[filtered_df['most_recent_sales_year'] >= 2024]
+    return {
+        'market_value': (filtered_df[models.feature_columns].values, filtered_df['most_recent_market_value'].values),
+        'sales_price': (recent_df[models.feature_columns].values, recent_df['most_recent_sales_price'].values),
+    }
+
+
+def run(df, n_splits=10, n_jobs=-1, directory=models.model_dir):
+    """Compares the candidates on both targets and writes the leaderboard next to the saved models."""
+    boards = []
+    with tempfile.TemporaryDirectory(prefix="home_values_cv_") as cache:
+        memory = Memory(cache, verbose=0)
+        for target, (X, y) in targets(df).items():
+            if len(y) < n_splits:
+                print(f"Skipping {target}: {len(y)} rows is fewer than {n_splits} folds")
+                continue
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=1)
+            board = compare_models(candidates(X_train, y_train, memory), X, y, folds(X, n_splits), n_jobs)
+            board.insert(0, 'target', target)
+            board['rows'] = len(y)
+            boards.append(board)
+    leaderboard = pd.concat(boards, ignore_index=True) if boards else pd.DataFrame()
+    write_leaderboard(leaderboard, models.dataset_hash(df), n_splits, directory)
+    return leaderboard
+
+
+def write_leaderboard(leaderboard, version, n_splits, directory=models.model_dir):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, leaderboard_name)
+    report = {
+        'dataset_hash': version,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'folds': n_splits,
+        'results': leaderboard.round(4).to_dict('records'),
+    }
+    with atomic_write(path) as file:
+        json.dump(report, file, indent=2)
+    return path
+
+
+def read_leaderboard(directory=models.model_dir):
+    """Returns (leaderboard frame, report metadata), or (None, None) if no comparison has been run."""
+    try:
+        with open(os.path.join(directory, leaderboard_name)) as file:
+            report = json.load(file)
+    except FileNotFoundError:
+        return None, None
+    return pd.DataFrame(report.pop('results')), report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validate the candidate models and write a leaderboard.")
+    parser.add_argument("output", nargs="?", default="output.csv", help="scraper output to evaluate on")
+    parser.add_argument("--folds", type=int, default=10)
+    parser.add_argument("--jobs", type=int, default=-1, help="cores to use, -1 for all")
+    parser.add_argument("--models", default=models.model_dir, help="directory the leaderboard is written to")
+    parser.add_argument("--delta-dir", default=delta_dir, help="the scraper's --delta-dir, to catch the cached tables up from")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    leaderboard = run(derive_features(load_dataset(args.output, deltas=args.delta_dir)), args.folds, args.jobs, args.models)
+    print(leaderboard.to_string(index=False))
+    print(f"Compared {len(leaderboard)} model/target pairs in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+from home_values.atomic import atomic_path, atomic_write, discard
+from home_values.data import content_hash, delta_dir, derive_features, load_dataset
+from sklearn.model_selection import train_test_split
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+import argparse
+import fcntl
+import json
+import os
+import time
+import joblib
+import numpy as np
+import sklearn
+
+# Model inputs, in the order the pipelines expect them
+feature_columns = ['total_sqft', 'year_built', 'bedrooms', 'bathrooms', 'has_garage', 'has_apt']
+
+# Columns the training data is read from, and so the columns the dataset hash covers
+training_columns = ['address', 'square_feet', *feature_columns, 'price_per_sqft', 'most_recent_sales_year',
+                    'most_recent_sales_price', 'most_recent_market_value']
+
+# Fitted models are saved here, one file per dataset hash
+model_dir = "models"
+
+# Bump when train_models changes so models fitted by the old code are retrained
+model_format = 1
+
+# Artifacts kept in model_dir besides the one in use; latest.json lists their hashes
+keep_versions = 4
+
+
+def training_frame(df):
+    """Keeps finished, sold and assessed homes and drops price/sqft outliers more than 2 standard deviations out."""
+    filtered_df = df.dropna(subset=['square_feet', 'most_recent_sales_price', 'most_recent_market_value'])
+
+    # Remove outliers
+    column = 'price_per_sqft'
+    filtered_df = filtered_df.dropna(subset=[column])
+    mean = filtered_df[column].mean()
+    std = filtered_df[column].std()
+    z_scores = (filtered_df[column] - mean) / std
+    return filtered_df[np.abs(z_scores) <= 2]
+
+
+def make_preprocessor():
+    # Scale the numerical columns and pass the binary garage / apartment columns through
+    numerical_columns = [0, 1, 2, 3]
+    binary_columns = [4, 5]
+    return ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), numerical_columns),
+            ('binary', 'passthrough', binary_columns)
+        ])
+
+
+def train_models(df):
+    """Train the Ridge market value model and the LinearRegression sales price model."""
+    filtered_df = training_frame(df)
+
+    # Train market value model (Ridge)
+    X = filtered_df[feature_columns].values
+    y_market = filtered_df['most_recent_market_value'].values
+    X_train, X_test, y_train, y_test = train_test_split(X, y_market, test_size=0.2, random_state=1)
+    market_model = Pipeline(steps=[
+        ('preprocessor', make_preprocessor()),
+        ('regressor', Ridge(alpha=1.0))
+    ])
+    market_model.fit(X_train, y_train)
+
+    # Train sales price model (recent sales only)
+    recent_df = filtered_df[filtered_df['most_recent_sales_year'] >= 2024]
+    X_sales = recent_df[feature_columns].values
+    y_sales = recent_df['most_recent_sales_price'].values
+
+    X_train_s, X_test_s, y_train_s, y_test_s = train_test_split(X_sales, y_sales, test_size=0.3, random_state=0)
+    sales_model = LinearRegression()
+    sales_model.fit(X_train_s, y_train_s)
+
+    return market_model, sales_model
+
+
+def dataset_hash(df):
+    """Hashes the training inputs of the properties table, so models are refit exactly when they change."""
+    return content_hash(df[training_columns], f"{model_format}:{sklearn.__version__}")
+
+
+def artifact_path(version, directory=model_dir):
+    return os.path.join(directory, f"models-{version}.joblib")
+
+
+def save_models(market_model, sales_model, version, rows, directory=model_dir):
+    """Writes both models and their metadata to one joblib file and records it as the latest version.
+
+    rows is the number of training rows. Processes training at the same time take turns under a
+    file lock, and only artifacts that latest.json no longer lists are removed, so an artifact
+    the latest version points to is never deleted.
+    """
+    os.makedirs(directory, exist_ok=True)
+    artifact = {
+        'market_model': market_model,
+        'sales_model': sales_model,
+        'dataset_hash': version,
+        'rows': rows,
+        'trained_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'sklearn': sklearn.__version__,
+    }
+    path = artifact_path(version, directory)
+    latest = os.path.join(directory, "latest.json")
+    with open(os.path.join(directory, "latest.json.lock"), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        with atomic_path(path) as temporary:
+            joblib.dump(artifact, temporary)
+
+        # Older artifacts are kept for a few versions to roll back to, then removed
+        try:
+            with open(latest) as file:
+                previous = json.load(file).get('versions', [])
+        except FileNotFoundError:
+            previous = []
+        versions = [version, *(kept for kept in previous if kept != version)][:keep_versions + 1]
+        metadata = {key: value for key, value in artifact.items() if not key.endswith('_model')}
+        with atomic_write(latest) as file:
+            json.dump({**metadata, 'versions': versions}, file, indent=2)
+        for kept in set(previous) - set(versions):
+            discard(artifact_path(kept, directory))
+    return path
+
+
+def load_models(version, directory=model_dir):
+    """Returns (market_model, sales_model) fitted on the dataset with this hash, or None if there are none."""
+    path = artifact_path(version, directory)
+    if not os.path.exists(path):
+        return None
+    artifact = joblib.load(path)
+    return artifact['market_model'], artifact['sales_model']
+
+
+def load_latest(directory=model_dir):
+    """Returns the most recently saved (market_model, sales_model), or None if nothing was saved yet."""
+    try:
+        with open(os.path.join(directory, "latest.json")) as file:
+            version = json.load(file)['dataset_hash']
+    except FileNotFoundError:
+        return None
+    return load_models(version, directory)
+
+
+def load_or_train(df, directory=model_dir):
+    """Loads the models fitted on this dataset, training and saving them only when the data has changed."""
+    version = dataset_hash(df)
+    fitted = load_models(version, directory)
+    if fitted is None:
+        fitted = train_models(df)
+        save_models(*fitted, version, len(training_frame(df)), directory)
+    return fitted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the market value and sales price models and save them to the model registry.")
+    parser.add_argument("output", nargs="?", default="output.csv", help="scraper output to train on")
+    parser.add_argument("--models", default=model_dir, help="directory of saved models")
+    parser.add_argument("--force", action="store_true", help="retrain even if models for this dataset exist")
+    parser.add_argument("--delta-dir", default=delta_dir, help="the scraper's --delta-dir, to catch the cached tables up from")
+    args = parser.parse_args()
+
+    df = derive_features(load_dataset(args.output, deltas=args.delta_dir))
+    version = dataset_hash(df)
+    if not args.force and os.path.exists(artifact_path(version, args.models)):
+        print(f"Models for dataset {version} are already saved in {artifact_path(version, args.models)}")
+        return
+    started = time.perf_counter()
+    path = save_models(*train_models(df), version, len(training_frame(df)), args.models)
+    print(f"Trained models for dataset {version} in {time.perf_counter() - started:.2f}s and saved them to {path}")
+
+
+if __name__ == "__main__":
+    main()
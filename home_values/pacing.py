@@ -0,0 +1,167 @@
+import asyncio
+import random
+import statistics
+import threading
+import time
+
+# Status codes the assessor server answers with when it is blocking us; every 5xx is retried as well
+block_statuses = (403, 429)
+
+
+class Blocked(Exception):
+    """Raised when the server refuses a request or answers with a blocking status code."""
+
+
+class TokenBucket:
+    """Token-bucket rate limiter whose rate can be lowered and raised while the scraper is running."""
+
+    def __init__(self, rate, capacity=1, min_rate=None, max_rate=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate or rate / 16
+        self.max_rate = max_rate or rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Takes `amount` tokens and returns how long the caller has to wait before using them.
+
+        A negative amount gives tokens back, for callers that reserved an estimate.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0, -self.tokens / self.rate)
+
+    def acquire(self, amount=1):
+        wait = self.reserve(amount)
+        time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, amount=1):
+        wait = self.reserve(amount)
+        await asyncio.sleep(wait)
+        return wait
+
+    def slow_down(self, factor=2):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / factor)
+
+    def speed_up(self, step=1.1):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate * step)
+
+
+class Backoff:
+    """Exponential backoff with full jitter."""
+
+    def __init__(self, base=2, cap=120, retries=4):
+        self.base = base
+        self.cap = cap
+        self.retries = retries
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+
+class LatencyStats:
+    """Collects per-request latencies so a run can report what the server actually took."""
+
+    def __init__(self):
+        self.samples = []
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def summary(self):
+        if not self.samples:
+            return {'requests': 0}
+        ordered = sorted(self.samples)
+        return {
+            'requests': len(ordered),
+            'mean': round(statistics.fmean(ordered), 3),
+            'p50': round(ordered[len(ordered) // 2], 3),
+            'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            'max': round(ordered[-1], 3),
+        }
+
+
+def check_response(response):
+    """Raises Blocked for responses that mean the server wants us to back off or failed, so the pacer retries them."""
+    status = getattr(response, 'status', None) or getattr(response, 'status_code', None)
+    if status in block_statuses or (isinstance(status, int) and status >= 500):
+        raise Blocked(f"server answered {status}")
+    return response
+
+
+class Pacer:
+    """Paces requests through a token bucket and retries slow, failing or blocked requests with backoff.
+
+    Requests slower than `slow_after` seconds or that fail halve the request rate; every
+    fast success nudges it back up towards the configured maximum. Rate limit waits,
+    request latencies, backoff sleeps and retries are also recorded in `metrics` if given.
+    """
+
+    def __init__(self, requests_per_second=0.5, slow_after=10, backoff=None, metrics=None):
+        self.bucket = TokenBucket(requests_per_second)
+        self.backoff = backoff or Backoff()
+        self.slow_after = slow_after
+        self.stats = LatencyStats()
+        self.retries = 0
+        self.metrics = metrics
+
+    def observe(self, stage, seconds):
+        if self.metrics:
+            self.metrics.observe(stage, seconds)
+
+    def settle(self, started):
+        latency = time.monotonic() - started
+        self.stats.record(latency)
+        self.observe('request', latency)
+        if latency > self.slow_after:
+            self.bucket.slow_down()
+        else:
+            self.bucket.speed_up()
+
+    def failed(self, attempt, e):
+        if attempt >= self.backoff.retries:
+            raise e
+        self.retries += 1
+        if self.metrics:
+            self.metrics.count('retries')
+        self.bucket.slow_down()
+        delay = self.backoff.delay(attempt)
+        self.observe('backoff', delay)
+        print(f"   Request failed ({e}), retrying in {delay:.1f}s")
+        return delay
+
+    def call(self, action, *args, **kwargs):
+        """Runs action(*args, **kwargs) once a token is available, retrying with backoff on failure."""
+        attempt = 0
+        while True:
+            self.observe('rate_limit_wait', self.bucket.acquire())
+            started = time.monotonic()
+            try:
+                result = check_response(action(*args, **kwargs))
+                self.settle(started)
+                return result
+            except Exception as e:
+                time.sleep(self.failed(attempt, e))
+                attempt += 1
+
+    async def call_async(self, action, *args, **kwargs):
+        """Async version of call for coroutine functions."""
+        attempt = 0
+        while True:
+            self.observe('rate_limit_wait', await self.bucket.acquire_async())
+            started = time.monotonic()
+            try:
+                result = check_response(await action(*args, **kwargs))
+                self.settle(started)
+                return result
+            except Exception as e:
+                await asyncio.sleep(self.failed(attempt, e))
+                attempt += 1
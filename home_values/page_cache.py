@@ -0,0 +1,154 @@
+from home_values.atomic import atomic_path
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode for a request that was never cached."""
+
+
+class CachedPage:
+    """The parts of a requests.Response the scrapers read, rebuilt from the cache."""
+
+    def __init__(self, url, text, status_code=200):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+
+def request_key(method, url, params=None, data=None):
+    """Identifies a request by its method, URL and form fields, independent of field order."""
+    request = json.dumps([method.upper(), url, sorted((params or {}).items()), sorted((data or {}).items())])
+    return hashlib.sha256(request.encode()).hexdigest()
+
+
+class PageCache:
+    """Persistent on-disk cache of fetched pages, keyed by URL and form parameters.
+
+    Page bodies are stored gzipped under the SHA-256 of their content, so identical pages
+    (such as repeated searches) are kept once. A SQLite index maps every request to its body.
+    Entries older than `ttl_days` are fetched again. Once the bodies take more than `max_mb`,
+    the least recently used entries are evicted. In replay mode the TTL is ignored and a
+    request that is not cached raises CacheMiss instead of touching the network.
+    """
+
+    def __init__(self, directory=".page_cache", ttl_days=30, max_mb=2048, replay=False):
+        self.directory = directory
+        self.ttl = ttl_days * 86400 if ttl_days is not None else None
+        self.max_bytes = max_mb * 2 ** 20
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False, isolation_level=None, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                method TEXT NOT NULL,
+                url TEXT NOT NULL,
+                final_url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS pages_used_at ON pages (used_at)")
+        self.total = self.size()
+
+    def object_path(self, content):
+        return os.path.join(self.directory, "objects", content[:2], f"{content}.html.gz")
+
+    def get(self, method, url, params=None, data=None):
+        """Returns the cached page for a request, or None when it is missing or expired."""
+        key = request_key(method, url, params, data)
+        with self.lock:
+            found = self.db.execute("SELECT final_url, status, content, fetched_at FROM pages WHERE key = ?", (key,)).fetchone()
+            fresh = found is not None and (self.replay or self.ttl is None or time.time() - found[3] <= self.ttl)
+            if fresh:
+                self.db.execute("UPDATE pages SET used_at = ? WHERE key = ?", (time.time(), key))
+            else:
+                self.misses += 1
+        if not fresh:
+            if self.replay:
+                raise CacheMiss(f"{method} {url} is not in the page cache")
+            return None
+        try:
+            with gzip.open(self.object_path(found[2]), 'rt', encoding='utf-8') as file:
+                text = file.read()
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            if self.replay:
+                raise CacheMiss(f"{method} {url} is indexed but its page is missing")
+            return None
+        with self.lock:
+            self.hits += 1
+        return CachedPage(found[0], text, found[1])
+
+    def put(self, method, url, response, params=None, data=None):
+        """Stores a fetched response and evicts the least recently used pages if the cache is too big."""
+        body = response.text.encode('utf-8')
+        content = hashlib.sha256(body).hexdigest()
+        path = self.object_path(content)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_path(path) as temporary, gzip.open(temporary, 'wb') as file:
+                file.write(body)
+            with self.lock:
+                self.total += os.path.getsize(path)
+
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (request_key(method, url, params, data), method.upper(), url, response.url,
+                             response.status_code, content, os.path.getsize(path), now, now))
+        if self.total > self.max_bytes:
+            self.evict()
+
+    def size(self):
+        """Bytes taken by the distinct page bodies."""
+        with self.lock:
+            return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT content, size FROM pages)").fetchone()[0]
+
+    def evict(self):
+        with self.lock:
+            entries = self.db.execute("SELECT key, content, size FROM pages ORDER BY used_at").fetchall()
+            sizes = {content: size for _, content, size in entries}
+            references = {}
+            for _, content, _ in entries:
+                references[content] = references.get(content, 0) + 1
+            total = sum(sizes.values())
+
+            # Evicts down to 90% of the limit so the next few pages don't each trigger another pass
+            for key, content, size in entries:
+                if total <= self.max_bytes * 0.9:
+                    break
+                self.db.execute("DELETE FROM pages WHERE key = ?", (key,))
+                references[content] -= 1
+                if references[content] == 0:
+                    total -= size
+                    try:
+                        os.remove(self.object_path(content))
+                    except FileNotFoundError:
+                        pass
+            self.total = total
+
+    def stats(self):
+        with self.lock:
+            pages = self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            hits, misses = self.hits, self.misses
+        return {'hits': hits, 'misses': misses, 'pages': pages, 'mb': round(self.size() / 2 ** 20, 1)}
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,69 @@
+"""Builds a parcel row from its detail page and "more detail" page, for every scraper.
+
+The steps live in one generator that never fetches anything itself: it yields the URL of each
+page it needs with the selector a browser should wait for, and is sent back the page's HTML and
+final URL. scrape_parcel and scrape_parcel_async drive it with a blocking or an async fetch.
+"""
+from home_values.parsing import building, detail_ready, parse_detail_page, parse_more_detail_page, print_parcel
+from contextlib import nullcontext
+
+
+def parcel_steps(url, metrics, address_list, lock=None):
+    """Yields (url, ready selector) per page and receives (html, page url); returns the row, or None for a duplicate address."""
+    with metrics.time('fetch_detail'):
+        html, page_url = yield url, detail_ready
+    with metrics.time('parse_detail'):
+        row, more_detail_url, errors = parse_detail_page(html, page_url)
+
+    # Confirms the address hasn't been previously scraped
+    with lock or nullcontext():
+        if row['address'] in address_list:
+            return None
+        address_list.add(row['address'])
+
+    if more_detail_url:
+        try:
+            with metrics.time('fetch_more_detail'):
+                html, _ = yield more_detail_url, building
+            with metrics.time('parse_more_detail'):
+                fields, more_errors = parse_more_detail_page(html)
+            row.update(fields)
+            errors += more_errors
+        except Exception as e:
+            errors.append(('more_details', e))
+
+    metrics.field_errors(errors)
+    print_parcel(row, errors)
+    return row
+
+
+def scrape_parcel(fetch, url, metrics, address_list, lock=None):
+    """Runs the parcel steps with fetch(url, ready_selector) -> (html, page url)."""
+    steps = parcel_steps(url, metrics, address_list, lock)
+    try:
+        request = next(steps)
+        while True:
+            try:
+                page = fetch(*request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(page)
+    except StopIteration as done:
+        return done.value
+
+
+async def scrape_parcel_async(fetch, url, metrics, address_list):
+    """Runs the parcel steps with an async fetch(url, ready_selector) -> (html, page url)."""
+    steps = parcel_steps(url, metrics, address_list)
+    try:
+        request = next(steps)
+        while True:
+            try:
+                page = await fetch(*request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(page)
+    except StopIteration as done:
+        return done.value
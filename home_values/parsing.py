@@ -0,0 +1,177 @@
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+import re
+
+# lxml is noticeably faster on large pages, but the standard library parser works everywhere
+try:
+    import lxml  # noqa: F401
+    html_parser = "lxml"
+except ImportError:
+    html_parser = "html.parser"
+
+# Columns of a scraped parcel row, in output.csv order
+fieldnames = ['address', 'square_feet', 'market_values', 'sales_prices', 'year_built', 'bedrooms', 'bathrooms', 'garage_sqft', 'garage_apt_sqft', 'porch_sqft', 'unfin_attic_sqft']
+
+# Present once a parcel detail page has loaded; the address is read from it
+detail_ready = "table:nth-child(4)"
+
+# Selectors for the building table on the "more detail" page
+building = "table:nth-child(4) tr:nth-child(1) td:nth-child(1) table:nth-child(1)"
+
+
+def make_soup(html):
+    return BeautifulSoup(html, html_parser)
+
+
+def text(soup, selector):
+    """Returns the whitespace-normalized text of the first element matching selector, like Playwright's inner_text."""
+    element = soup.select_one(selector)
+    if element is None:
+        raise LookupError(f"no element matches {selector!r}")
+    return " ".join(element.get_text().split())
+
+
+def empty_row(address):
+    return {'address': address, 'square_feet': None, 'market_values': {}, 'sales_prices': {}, 'year_built': None,
+            'bedrooms': None, 'bathrooms': None, 'garage_sqft': 0, 'garage_apt_sqft': 0, 'porch_sqft': 0,
+            'unfin_attic_sqft': 0}
+
+
+def result_links(html, base_url):
+    """Returns the de-duplicated, absolute detail page URLs from a search result page.
+
+    Raises LookupError for a page without a result table, such as an error page, so it is not taken for an empty search.
+    """
+    soup = make_soup(html)
+    if soup.select_one("table:nth-child(4)") is None:
+        raise LookupError("no result table on the search result page")
+    hrefs = [urljoin(base_url, link['href']) for link in soup.select("table:nth-child(4) a[href]")]
+    return list(dict.fromkeys(hrefs))
+
+
+def parse_address(soup):
+    return text(soup, "table:nth-child(4) tr:nth-child(1) td:nth-child(5) p").split(",")[0].strip()
+
+
+def parse_market_values(soup, errors):
+    num_rows = len(soup.select("table:nth-child(7) tr"))
+    market_values = {}
+    for row in range(1, num_rows - 1):
+        try:
+            year = int(text(soup, f"table:nth-child(7) tr:nth-child({row}) td:nth-child(1) p"))
+            market_value = int(text(soup, f"table:nth-child(7) tr:nth-child({row}) td:nth-child(2) p").replace(',', ''))
+            if market_value > 100000:
+                market_values[year] = market_value
+            else:
+                break
+        except Exception as e:
+            errors.append(('market_values', e))
+    return market_values
+
+
+def parse_sales_prices(soup, errors):
+    num_rows = len(soup.select("table:nth-child(10) tr"))
+    sales_prices = {}
+    for row in range(1, num_rows - 1):
+        try:
+            year = int(text(soup, f"table:nth-child(10) tr:nth-child({row}) td:nth-child(1) p")[-4:])
+            sales_price = int(text(soup, f"table:nth-child(10) tr:nth-child({row}) td:nth-child(6) p").replace('$', '').replace(',', '').strip())
+            if sales_price > 150000 and year not in sales_prices:
+                sales_prices[year] = sales_price
+        except Exception as e:
+            errors.append(('sales_prices', e))
+    return sales_prices
+
+
+def more_detail_link(soup, base_url):
+    """Returns the "more detail" page URL, or None when the parcel has no building record."""
+    table = soup.select_one("table:nth-child(13)")
+    if table is None or len(table.find_all("td")) <= 1:
+        return None
+    link = table.select_one("a[href]")
+    return urljoin(base_url, link['href']) if link else None
+
+
+def parse_square_feet(soup):
+    return int(text(soup, f"{building} tr:nth-child(5) td:nth-child(2) font").replace(',', ''))
+
+
+def parse_year_built(soup):
+    return int(text(soup, f"{building} tr:nth-child(6) td:nth-child(2) font").replace(',', ''))
+
+
+def parse_bedrooms(soup):
+    bedrooms_match = re.search(r'\(\s*(\d+)\s*\).*?(\d+)', text(soup, f"{building} tr:nth-child(20) td:nth-child(2) font").replace(',', ''))
+    return int(bedrooms_match.group(2)) if bedrooms_match else None
+
+
+def parse_bathrooms(soup):
+    bathrooms = re.findall(r'\((\d+)\)', text(soup, f"{building} tr:nth-child(21) td:nth-child(2) font").replace(',', ''))
+    return int(bathrooms[0]) + int(bathrooms[1]) + int(bathrooms[2]) / 2
+
+
+def parse_outbuildings(soup):
+    """Sums the garage, garage apartment, porch and unfinished attic square footage."""
+    totals = {'garage_sqft': 0, 'garage_apt_sqft': 0, 'porch_sqft': 0, 'unfin_attic_sqft': 0}
+    num_rows = len(soup.select("table:nth-child(5) tr"))
+    for tr in range(1, num_rows - 1):
+        td_text = text(soup, f"table:nth-child(5) tr:nth-child({tr}) td:nth-child(2) p")
+        if not any(code in td_text for code in ("Gar", "Por", "UA")):
+            continue
+        sqft = int(text(soup, f"table:nth-child(5) tr:nth-child({tr}) td:nth-child(4) p"))
+        if "GarApart" in td_text:
+            totals['garage_apt_sqft'] += sqft
+        if "Gar" in td_text:
+            totals['garage_sqft'] += sqft
+        if "Por" in td_text:
+            totals['porch_sqft'] += sqft
+        if "UA" in td_text:
+            totals['unfin_attic_sqft'] += sqft
+    return totals
+
+
+def parse_detail_page(html, base_url):
+    """Parses a parcel detail page into (row, more detail URL, errors)."""
+    soup = make_soup(html)
+    errors = []
+    row = empty_row(parse_address(soup))
+    row['market_values'] = parse_market_values(soup, errors)
+    row['sales_prices'] = parse_sales_prices(soup, errors)
+    return row, more_detail_link(soup, base_url), errors
+
+
+def parse_more_detail_page(html):
+    """Parses the building fields of a "more detail" page into (fields, errors)."""
+    soup = make_soup(html)
+    fields = {}
+    errors = []
+    for field, parse in (('square_feet', parse_square_feet), ('year_built', parse_year_built),
+                         ('bedrooms', parse_bedrooms), ('bathrooms', parse_bathrooms)):
+        try:
+            fields[field] = parse(soup)
+        except Exception as e:
+            errors.append((field, e))
+    try:
+        fields.update(parse_outbuildings(soup))
+    except Exception as e:
+        errors.append(('outbuildings', e))
+    return fields, errors
+
+
+def print_parcel(row, errors):
+    """Prints a scraped parcel the same way the Playwright scraper always has, in one write so worker threads don't interleave."""
+    lines = [f"Address:  {row['address']}"]
+    lines += [f"   Error encountered while trying to collect {field.replace('_', ' ')}: {e}" for field, e in errors]
+    lines += [
+        f"   Market Values:  {row['market_values']}",
+        f"   Sales Prices:  {row['sales_prices']}",
+        f"   Square Feet:  {row['square_feet']}",
+        f"   Year Built:  {row['year_built']}",
+        f"   Bedrooms: {row['bedrooms'] if row['bedrooms'] is not None else 'Unknown'}",
+        f"   Bathrooms: {row['bathrooms']}",
+        f"   Garage Apt Sq Footage: {row['garage_apt_sqft']}",
+        f"   Garage Sq Footage: {row['garage_sqft']}",
+        f"   Porch Sq Footage: {row['porch_sqft']}",
+        f"   Unfinished Attic Sq Footage: {row['unfin_attic_sqft']}",
+    ]
+    print("\n".join(lines))
@@ -0,0 +1,113 @@
+from home_values.atomic import atomic_write
+import fcntl
+import json
+import os
+import time
+
+
+def split_shard(shard):
+    """Splits a wildcard shard on its first '%' into narrower shards, e.g. "1%%% Oso Ave" into "1 Oso Ave" and "10%% Oso Ave".."19%% Oso Ave".
+
+    '%' matches like in SQL LIKE, so it also matches nothing: the prefix without the wildcards that
+    follow it is a shard of its own, and a lone '%' is kept after the digit ("10%" into "100%".."109%").
+    """
+    position = shard.find("%")
+    if position == -1:
+        return [shard]
+    prefix, rest = shard[:position], shard[position:].lstrip("%")
+    wildcards = shard[position + 1:len(shard) - len(rest)] or "%"
+    narrower = [prefix + str(digit) + wildcards + rest for digit in range(10)]
+    if prefix:
+        narrower.insert(0, prefix + rest)
+    return narrower
+
+
+def expand_shards(patterns, levels=0):
+    """Splits every address pattern `levels` times, keeping the order of the patterns."""
+    shards = list(patterns)
+    for _ in range(levels):
+        shards = [narrower for shard in shards for narrower in split_shard(shard)]
+    return list(dict.fromkeys(shards))
+
+
+class SearchPlanner:
+    """Decides which wildcard searches to run and drops detail links that were already queued.
+
+    Every search records its result count in a JSON prefix index. Patterns known to be empty are
+    skipped, and patterns whose result table reached `max_results` (so it may be cut off) are
+    split into narrower prefixes. Later runs go straight to those prefixes without probing the
+    wide pattern again. Index entries older than `max_age_days` are probed again, since new
+    homes keep appearing on streets that used to be empty.
+    """
+
+    def __init__(self, path="prefix_index.json", max_results=100, max_age_days=30):
+        self.path = path
+        self.max_results = max_results
+        self.max_age = max_age_days * 86400
+        self.index = {}
+        if path and os.path.exists(path):
+            with open(path) as file:
+                self.index = json.load(file)
+        self.seen = set()
+        self.counts = {'searches': 0, 'skipped_empty': 0, 'split': 0, 'duplicate_links': 0}
+
+    def known(self, pattern):
+        entry = self.index.get(pattern)
+        if entry is None or time.time() - entry['checked_at'] > self.max_age:
+            return None
+        return entry['results']
+
+    def too_large(self, pattern, results):
+        return results >= self.max_results and "%" in pattern
+
+    def plan(self, patterns):
+        """Returns the patterns to search, skipping known-empty ones and replacing known-large ones by their prefixes."""
+        planned = []
+        for pattern in patterns:
+            results = self.known(pattern)
+            if results == 0:
+                self.counts['skipped_empty'] += 1
+            elif results is not None and self.too_large(pattern, results):
+                planned += self.plan(split_shard(pattern))
+            else:
+                planned.append(pattern)
+        return list(dict.fromkeys(planned))
+
+    def record(self, pattern, hrefs):
+        """Records a search's result count and returns (new detail links, narrower patterns still to search)."""
+        self.counts['searches'] += 1
+        self.index[pattern] = {'results': len(hrefs), 'checked_at': time.time()}
+        children = []
+        if self.too_large(pattern, len(hrefs)):
+            self.counts['split'] += 1
+            children = self.plan(split_shard(pattern))
+        return self.new_links(hrefs), children
+
+    def new_links(self, hrefs):
+        """Drops links that an earlier search in this run already returned."""
+        new = []
+        for href in hrefs:
+            if href in self.seen:
+                self.counts['duplicate_links'] += 1
+            else:
+                self.seen.add(href)
+                new.append(href)
+        return new
+
+    def save(self):
+        """Merges the prefix index into its file, keeping the most recent entry of every pattern.
+
+        Crawl workers share the file, so it is read again under a lock and written atomically;
+        one worker's save never drops the patterns another one recorded.
+        """
+        if not self.path:
+            return
+        with open(f"{self.path}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(self.path):
+                with open(self.path) as file:
+                    for pattern, entry in json.load(file).items():
+                        if entry['checked_at'] > self.index.get(pattern, {'checked_at': 0})['checked_at']:
+                            self.index[pattern] = entry
+            with atomic_write(self.path) as file:
+                json.dump(self.index, file, indent=1, sort_keys=True)
@@ -0,0 +1,153 @@
+"""Scores a file of properties with the fitted market value and sales price models.
+
+    python -m home_values.predict listings.csv predictions.csv
+    python -m home_values.predict listings.parquet predictions.parquet --chunk-size 100000
+
+Rows need either the model features (total_sqft, year_built, bedrooms, bathrooms, has_garage,
+has_apt) or the scraper columns they are derived from (square_feet, unfin_attic_sqft,
+garage_apt_sqft, garage_sqft, year_built, bedrooms, bathrooms).
+"""
+from home_values import models
+from home_values.atomic import discard, partial_path, sync
+from home_values.data import delta_dir, derive_features, load_dataset, model_features
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Scraper columns model_features reads; the outbuildings default to none when a feed leaves them out
+raw_columns = {'square_feet': np.nan, 'unfin_attic_sqft': 0, 'garage_apt_sqft': 0, 'garage_sqft': 0}
+
+
+def prepare(df):
+    """Derives the model features the same way derive_features does, unless the rows already carry them."""
+    if all(column in df for column in models.feature_columns):
+        return df
+    for column, default in raw_columns.items():
+        if column not in df:
+            df[column] = default
+    return model_features(df)
+
+
+def score_frame(df, market_model, sales_model):
+    """Adds predicted_market_value, predicted_sales_price and predicted_price_per_sqft to a frame of properties.
+
+    Rows missing a feature get no prediction instead of failing the whole batch.
+    """
+    df = prepare(df)
+    X = df[models.feature_columns].to_numpy(dtype=float)
+    valid = ~np.isnan(X).any(axis=1)
+    market = np.full(len(df), np.nan)
+    sales = np.full(len(df), np.nan)
+    if valid.any():
+        market[valid] = market_model.predict(X[valid])
+        sales[valid] = sales_model.predict(X[valid])
+    df['predicted_market_value'] = market.round(0)
+    df['predicted_sales_price'] = sales.round(0)
+    df['predicted_price_per_sqft'] = (df['predicted_sales_price'] / df['total_sqft']).where(df['total_sqft'] > 0).round(2)
+    return df
+
+
+def read_chunks(path, chunk_size):
+    """Yields the rows of a .csv, .jsonl or .parquet file as frames of at most chunk_size rows."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif extension == ".jsonl":
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a partial .csv, .jsonl or .parquet file.
+
+    The file is fsynced and renamed into place when the writer's block exits cleanly. If the
+    block raises, the partial file is deleted and an earlier output is left as it was.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.partial = partial_path(path)
+        self.extension = os.path.splitext(path)[1].lower()
+        self.parquet = None
+        self.file = open(self.partial, 'wb') if self.extension == ".parquet" else open(self.partial, 'w', newline='')
+        self.header = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, df):
+        if self.extension == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self.parquet is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self.parquet = pq.ParquetWriter(self.file, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self.parquet.schema, preserve_index=False)
+            self.parquet.write_table(table)
+        elif self.extension == ".jsonl":
+            df.to_json(self.file, orient='records', lines=True)
+        else:
+            df.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def finish(self):
+        if self.parquet:
+            self.parquet.close()
+
+    def close(self):
+        self.finish()
+        sync(self.file)
+        self.file.close()
+        os.replace(self.partial, self.path)
+
+    def discard(self):
+        self.finish()
+        self.file.close()
+        discard(self.partial)
+
+
+def score_file(input_path, output_path, market_model, sales_model, chunk_size=50_000):
+    """Streams input_path through the models chunk by chunk, so memory stays bounded by chunk_size rows."""
+    started = time.perf_counter()
+    rows = 0
+    with ChunkWriter(output_path) as writer:
+        for chunk in read_chunks(input_path, chunk_size):
+            writer.write(score_frame(chunk, market_model, sales_model))
+            rows += len(chunk)
+    seconds = time.perf_counter() - started
+    return {'rows': rows, 'seconds': round(seconds, 3), 'rows_per_second': round(rows / seconds) if seconds else rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict market values and sales prices for a file of properties.")
+    parser.add_argument("input", help="properties to score; .csv, .jsonl or .parquet")
+    parser.add_argument("output", help="where to write the predictions; .csv, .jsonl or .parquet")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="rows scored at a time")
+    parser.add_argument("--models", default=models.model_dir, help="directory of saved models")
+    parser.add_argument("--data", default="output.csv", help="scraper output to train on if no models are saved")
+    parser.add_argument("--delta-dir", default=delta_dir, help="the scraper's --delta-dir, to catch the cached tables up from")
+    args = parser.parse_args()
+
+    fitted = models.load_latest(args.models)
+    if fitted is None:
+        print(f"No saved models in {args.models}, training on {args.data}")
+        fitted = models.load_or_train(derive_features(load_dataset(args.data, deltas=args.delta_dir)), args.models)
+
+    stats = score_file(args.input, args.output, *fitted, args.chunk_size)
+    print(f"Scored {stats['rows']:,} properties in {stats['seconds']}s ({stats['rows_per_second']:,} rows/s) into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
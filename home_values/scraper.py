@@ -0,0 +1,151 @@
+from home_values import async_scraper, diff, http_scraper
+from home_values.checkpoint import CheckpointStore
+from home_values.metrics import Metrics
+from home_values.page_cache import PageCache
+from home_values.planner import SearchPlanner
+from home_values.playwright_scraper import addresses, search_url
+from home_values.sinks import open_sink
+import argparse
+import asyncio
+import os
+
+
+def make_planner(args):
+    return SearchPlanner(args.prefix_index, args.max_results, args.prefix_max_age)
+
+
+def make_cache(args):
+    """Opens the page cache of the http backend. Pages older than --max-age are fetched again, like the parcels they belong to."""
+    if (args.no_cache and not args.replay) or backend_for(args) is run_playwright:
+        return None
+    ttl = args.cache_ttl if args.max_age is None else min(args.cache_ttl, args.max_age)
+    return PageCache(args.cache_dir, ttl, args.cache_mb, replay=args.replay)
+
+
+def run_playwright(args, on_row, checkpoint, max_age, metrics, planner, cache=None):
+    return asyncio.run(async_scraper.scrape(args.addresses, on_row, args.rps, args.url, contexts=args.contexts,
+                                            pages_per_context=args.pages, headless=not args.headed,
+                                            checkpoint=checkpoint, max_age=max_age, planner=planner, metrics=metrics))
+
+
+def run_http(args, on_row, checkpoint, max_age, metrics, planner, cache=None):
+    return http_scraper.scrape(args.addresses, on_row, args.rps, args.url, workers=args.workers,
+                               checkpoint=checkpoint, max_age=max_age, planner=planner, cache=cache, metrics=metrics)
+
+
+# Every backend takes the address ranges, calls on_row once for each newly scraped parcel, records
+# stage timings and counters in metrics and returns the ranges whose search failed. The caller
+# opens the planner and page cache, so a crawl worker keeps one of each for all of its shards
+backends = {'playwright': run_playwright, 'http': run_http}
+
+
+def add_backend_arguments(parser):
+    """Adds the backend, output and checkpoint options shared by the scraper and crawl CLIs."""
+    parser.add_argument("--backend", choices=backends, default="playwright", help="drive a browser or talk plain HTTP")
+    parser.add_argument("--output", default="output.csv", help="output file; .csv, .jsonl or .parquet")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows buffered before each flush to the output")
+    parser.add_argument("--checkpoint", default="checkpoint.db", help="SQLite file recording finished parcels")
+    parser.add_argument("--max-age", type=float, help="re-fetch finished parcels older than this many days")
+    parser.add_argument("--rps", type=float, default=0.5, help="global requests-per-second budget")
+    parser.add_argument("--url", default=search_url, help="search page URL, e.g. a local fixture server")
+    parser.add_argument("--contexts", type=int, default=2, help="playwright: number of isolated browser contexts")
+    parser.add_argument("--pages", type=int, default=2, help="playwright: pages opened in each context")
+    parser.add_argument("--headed", action="store_true", help="playwright: show the Chromium windows")
+    parser.add_argument("--workers", type=int, default=4, help="http: number of parallel connections")
+    parser.add_argument("--prefix-index", default="prefix_index.json", help="JSON cache of result counts per search pattern")
+    parser.add_argument("--max-results", type=int, default=100, help="split searches returning at least this many results")
+    parser.add_argument("--prefix-max-age", type=float, default=30, help="days before a cached result count is probed again")
+    parser.add_argument("--cache-dir", default=".page_cache", help="http: on-disk cache of fetched pages")
+    parser.add_argument("--cache-ttl", type=float, default=30, help="http: days before a cached page is fetched again")
+    parser.add_argument("--cache-mb", type=float, default=2048, help="http: evict least recently used pages beyond this size")
+    parser.add_argument("--no-cache", action="store_true", help="http: always fetch pages from the site")
+    parser.add_argument("--replay", action="store_true", help="re-parse every page from the cache without network access")
+    parser.add_argument("--metrics", default="run_summary.json", help="JSON run summary with stage timings and counters")
+    parser.add_argument("--prometheus-file", help="keep a Prometheus text file with the run metrics up to date")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port while running")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="address the metrics server listens on; 0.0.0.0 for every interface")
+    parser.add_argument("--delta-dir", default=diff.delta_dir, help="where the snapshot of the last output and the deltas since are kept")
+    parser.add_argument("--no-delta", action="store_true", help="do not diff the output against the previous scrape")
+
+
+def record_delta(args):
+    """Diffs the output just written against the previous scrape, so loaders can apply the changes instead of re-reading it."""
+    if args.no_delta:
+        return
+    header = diff.record_scrape(args.output, args.delta_dir)
+    if header:
+        print(f"Changes since the previous scrape: {header['counts']}")
+
+
+def max_age_seconds(args):
+    # A replay re-parses every cached parcel, including the ones already marked done
+    if args.replay:
+        return 0
+    return args.max_age * 86400 if args.max_age is not None else None
+
+
+def backend_for(args):
+    """Replays are served by the http backend, which is the one that reads and fills the page cache."""
+    return backends['http'] if args.replay else backends[args.backend]
+
+
+def suffixed(path, suffix):
+    stem, extension = os.path.splitext(path)
+    return f"{stem}{suffix}{extension}"
+
+
+def start_metrics(args, suffix=""):
+    """Starts a run's metrics. Crawl workers pass a suffix so each one writes its own files."""
+    metrics = Metrics()
+    metrics.export(args.prometheus_file and suffixed(args.prometheus_file, suffix), args.metrics_port, host=args.metrics_host)
+    return metrics
+
+
+def finish_metrics(args, metrics, suffix=""):
+    """Writes the JSON run summary (and the final Prometheus file) and prints the headline numbers."""
+    summary = metrics.summary()
+    if args.metrics:
+        metrics.write_summary(suffixed(args.metrics, suffix))
+    if args.prometheus_file:
+        metrics.write_prometheus(suffixed(args.prometheus_file, suffix))
+    print(f"Run summary: {summary['parcels_per_minute']} parcels/minute over {summary['elapsed_seconds']}s, counters {summary['counters']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape home values from the Oklahoma County Assessor site.")
+    add_backend_arguments(parser)
+    parser.add_argument("addresses", nargs="*", default=addresses)
+    args = parser.parse_args()
+
+    # Every parcel is checkpointed as soon as it is scraped, so a crashed run picks up where it stopped
+    checkpoint = CheckpointStore(args.checkpoint)
+    max_age = max_age_seconds(args)
+    scraped = set()
+    planner = make_planner(args)
+    cache = make_cache(args)
+    metrics = start_metrics(args)
+    try:
+        # Rows are streamed to the output as they come in. A run that raises keeps the previous output,
+        # and the next run resumes from the checkpoint
+        with open_sink(args.output, args.batch_size) as sink:
+            def on_row(row):
+                scraped.add(row['address'])
+                sink.write(row)
+            backend_for(args)(args, on_row, checkpoint, max_age, metrics, planner, cache)
+
+            # Parcels finished by earlier runs and not fetched again keep their stored rows
+            for row in checkpoint.rows():
+                if row['address'] not in scraped:
+                    sink.write(row)
+    finally:
+        checkpoint.close()
+        if cache:
+            cache.close()
+        finish_metrics(args, metrics)
+    record_delta(args)
+
+    print(f"Successfully collected all address data! {len(scraped)} parcels scraped in this run.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+from home_values.atomic import discard, partial_path, sync
+from home_values.parsing import fieldnames
+from abc import ABC, abstractmethod
+import csv
+import json
+import os
+
+# Scalar columns of the properties table; the year -> value histories live in their own long tables
+property_columns = [field for field in fieldnames if field not in ('market_values', 'sales_prices')]
+
+
+def long_tables(rows):
+    """Splits scraped rows into properties, market_values(address, year, value) and sales(address, year, price) records.
+
+    `seq` keeps each entry's position on the assessor page, so seq 0 is the most recent value or sale.
+    """
+    tables = {'properties': [], 'market_values': [], 'sales': []}
+    for row in rows:
+        tables['properties'].append(row)
+        for seq, (year, value) in enumerate(row['market_values'].items()):
+            tables['market_values'].append({'address': row['address'], 'year': int(year), 'value': value, 'seq': seq})
+        for seq, (year, price) in enumerate(row['sales_prices'].items()):
+            tables['sales'].append({'address': row['address'], 'year': int(year), 'price': price, 'seq': seq})
+    return tables
+
+
+class RowSink(ABC):
+    """Buffers scraped rows and writes them in batches to a properties file plus long market value and sales tables.
+
+    Batches are appended and fsynced to partial files, which replace the real files with an
+    atomic rename when the sink is closed, so readers never see a half-written table. A sink
+    left by an exception discards its partial files and the previous output stays in place.
+    """
+
+    extension = None
+
+    def __init__(self, path, batch_size=500):
+        stem = os.path.splitext(path)[0]
+        self.paths = {'properties': path, 'market_values': f"{stem}_market_values{self.extension}",
+                      'sales': f"{stem}_sales{self.extension}"}
+        self.partials = {name: partial_path(path) for name, path in self.paths.items()}
+        self.batch_size = batch_size
+        self.buffer = []
+        self.rows_written = 0
+        self.open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, row):
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            for name, records in long_tables(self.buffer).items():
+                self.write_batch(name, records)
+            self.rows_written += len(self.buffer)
+            self.buffer = []
+        self.sync()
+
+    def close(self):
+        self.flush()
+        self.finish()
+        for name, path in self.paths.items():
+            os.replace(self.partials[name], path)
+
+    def discard(self):
+        """Closes the sink without publishing anything written to it."""
+        self.finish()
+        for partial in self.partials.values():
+            discard(partial)
+
+    def open(self):
+        self.files = {name: open(partial, 'w', newline='') for name, partial in self.partials.items()}
+
+    def sync(self):
+        for file in self.files.values():
+            sync(file)
+
+    def finish(self):
+        for file in self.files.values():
+            file.close()
+
+    @abstractmethod
+    def write_batch(self, name, records):
+        """Appends the records of one table."""
+
+
+class CsvSink(RowSink):
+    """CSV output. The properties file keeps the dict columns so it stays compatible with output.csv."""
+
+    extension = ".csv"
+
+    def open(self):
+        super().open()
+        columns = {'properties': fieldnames, 'market_values': ['address', 'year', 'value', 'seq'],
+                   'sales': ['address', 'year', 'price', 'seq']}
+        self.writers = {name: csv.DictWriter(file, fieldnames=columns[name]) for name, file in self.files.items()}
+        for writer in self.writers.values():
+            writer.writeheader()
+
+    def write_batch(self, name, records):
+        self.writers[name].writerows(records)
+
+
+class JsonLinesSink(RowSink):
+    extension = ".jsonl"
+
+    def write_batch(self, name, records):
+        self.files[name].writelines(json.dumps(record) + "\n" for record in records)
+
+
+class ParquetSink(RowSink):
+    """Columnar Parquet output with one row group per batch. Needs pyarrow."""
+
+    extension = ".parquet"
+
+    def open(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.schemas = {
+            'properties': pa.schema([('address', pa.string()), ('square_feet', pa.int64()), ('year_built', pa.int64()),
+                                     ('bedrooms', pa.int64()), ('bathrooms', pa.float64()), ('garage_sqft', pa.int64()),
+                                     ('garage_apt_sqft', pa.int64()), ('porch_sqft', pa.int64()),
+                                     ('unfin_attic_sqft', pa.int64())]),
+            'market_values': pa.schema([('address', pa.string()), ('year', pa.int32()), ('value', pa.int64()), ('seq', pa.int16())]),
+            'sales': pa.schema([('address', pa.string()), ('year', pa.int32()), ('price', pa.int64()), ('seq', pa.int16())]),
+        }
+        # The writers get file objects so every row group can be fsynced like the text formats
+        self.files = {name: open(partial, 'wb') for name, partial in self.partials.items()}
+        self.writers = {name: pq.ParquetWriter(self.files[name], self.schemas[name]) for name in self.paths}
+
+    def write_batch(self, name, records):
+        if name == 'properties':
+            records = [{column: record[column] for column in property_columns} for record in records]
+        self.writers[name].write_table(self.pa.Table.from_pylist(records, schema=self.schemas[name]))
+
+    def finish(self):
+        # Closing a writer appends the Parquet footer, which is synced before the file is closed
+        for writer in self.writers.values():
+            writer.close()
+        self.sync()
+        super().finish()
+
+
+sinks = {'.csv': CsvSink, '.jsonl': JsonLinesSink, '.parquet': ParquetSink}
+
+
+def open_sink(path, batch_size=500):
+    """Opens the sink matching the file extension of path (.csv, .jsonl or .parquet)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in sinks:
+        raise ValueError(f"unsupported output format {extension!r}, expected one of {', '.join(sinks)}")
+    return sinks[extension](path, batch_size)
+
+
+def write_rows(rows, path, batch_size=500):
+    with open_sink(path, batch_size) as sink:
+        for row in rows:
+            sink.write(row)
+    return sink.rows_written
@@ -0,0 +1,186 @@
+"""Market Trends aggregates and the charts drawn from them.
+
+    python -m home_values.trends output.csv
+
+The per-year and per-street tables and both quadratic trend lines come from a few group-bys
+over the sales frame, which take milliseconds even for a whole county. Drawing the charts is
+the slow part, so each chart is rendered once per chart type and content of the sales frame
+and saved as a PNG in .trends_cache/charts.
+"""
+from home_values.atomic import atomic_path
+from home_values.data import content_hash, delta_dir, derive_features, load_dataset, sales_frame, split_sales, yearly_stats
+import argparse
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+
+trends_dir = ".trends_cache"
+
+# Bump when the charts are drawn differently so the saved PNGs are replaced
+trends_format = 2
+
+# Charts are kept for this many versions of the sales data, for callers a scrape behind
+keep_versions = 3
+
+chart_types = [
+    "All Sales - Price/Sq Ft by Year",
+    "Initial Sales - Price/Sq Ft by Year",
+    "Sales Volume by Year",
+    "Average Sales Price by Year",
+]
+
+sales_columns = ['address', 'year', 'sales_price', 'price_per_sqft']
+
+
+def streets(addresses):
+    """The street of every address, without its house number."""
+    codes, unique = pd.factorize(addresses)
+    names = pd.Series(unique, dtype=object).str.replace(r'^\S*\d\S*\s+', '', regex=True).str.strip()
+    return pd.Series(names.to_numpy()[codes], index=addresses.index)
+
+
+def trend(points):
+    """Coefficients of the quadratic price/sqft trend of some sales, or None with too few distinct years."""
+    if points['year'].nunique() <= 2:
+        return None
+    return np.polyfit(points['year'], points['price_per_sqft'], 2)
+
+
+class TrendAggregates:
+    """The per-year and per-street tables, scatter points and trend lines of a sales frame.
+
+    `version` is a hash of the sales themselves, so charts cached under it always match the
+    population they were drawn from, whichever caller filtered it.
+    """
+
+    def __init__(self, df_sales):
+        self.version = content_hash(df_sales[sales_columns], f"trends:{trends_format}")
+        initial = df_sales.index.isin(split_sales(df_sales)[0].index)
+        self.rows = pd.DataFrame({'year': df_sales['year'], 'price_per_sqft': df_sales['price_per_sqft'], 'initial': initial})
+        self.yearly = yearly_stats(df_sales)
+        self.years = df_sales.groupby('year')['sales_price'].agg(['count', 'mean'])
+        self.streets = df_sales.groupby(streets(df_sales['address']).rename('Street')).agg(
+            **{'# Sales': ('sales_price', 'size'), 'Avg Price': ('sales_price', 'mean'), 'Avg $/SqFt': ('price_per_sqft', 'mean')})
+        self.trends = {'all': trend(self.rows), 'initial': trend(self.rows[self.rows['initial']])}
+
+    def yearly_stats(self):
+        """Sales count, mean and median price and mean price/sqft for every year, like data.yearly_stats."""
+        return self.yearly.copy()
+
+    def sales_by_year(self):
+        return self.years['count']
+
+    def average_price_by_year(self):
+        return self.years['mean']
+
+    def mean_price_per_sqft(self, first_year, last_year=None):
+        """Mean price/sqft of every sale from first_year through last_year (or the latest year)."""
+        years = self.rows['year']
+        selected = (years >= first_year) & (years <= last_year if last_year is not None else True)
+        return self.rows.loc[selected, 'price_per_sqft'].mean()
+
+    def street_stats(self):
+        """Sales count, mean price and mean price/sqft for every street, busiest first."""
+        stats = self.streets.round({'Avg Price': 0, 'Avg $/SqFt': 0})
+        return stats.sort_values('# Sales', ascending=False, kind='stable')
+
+    def trend(self, name):
+        """Coefficients of the quadratic price/sqft trend of 'all' or 'initial' sales, like np.polyfit."""
+        return self.trends[name]
+
+
+def draw_chart(aggregates, chart_type):
+    """Draws one of the Market Trends charts from the aggregates and returns the figure."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+
+    if chart_type in chart_types[:2]:
+        initial = chart_type == chart_types[1]
+        points = aggregates.rows[aggregates.rows['initial']] if initial else aggregates.rows
+        ax.scatter(points['year'], points['price_per_sqft'], alpha=0.6, color='green' if initial else 'blue')
+
+        # Trend line
+        coefficients = aggregates.trend('initial' if initial else 'all')
+        if coefficients is not None:
+            trend_line = np.poly1d(coefficients)
+            x_values = np.linspace(points['year'].min(), points['year'].max(), 100)
+            ax.plot(x_values, trend_line(x_values), color='red', linewidth=2, label='Trend')
+
+        ax.set_xlabel('Year')
+        ax.set_ylabel('Price per Square Foot ($)')
+        ax.set_title(f"{'Initial' if initial else 'All'} Sales - Price per Square Foot by Year")
+        ax.grid(True, alpha=0.3)
+
+    elif chart_type == "Sales Volume by Year":
+        sales_by_year = aggregates.sales_by_year()
+        ax.bar(sales_by_year.index, sales_by_year.values, color='steelblue')
+        ax.set_xlabel('Year')
+        ax.set_ylabel('Number of Sales')
+        ax.set_title('Sales Volume by Year')
+        ax.grid(True, alpha=0.3, axis='y')
+
+    elif chart_type == "Average Sales Price by Year":
+        avg_by_year = aggregates.average_price_by_year()
+        ax.bar(avg_by_year.index, avg_by_year.values, color='coral')
+        ax.set_xlabel('Year')
+        ax.set_ylabel('Average Sales Price ($)')
+        ax.set_title('Average Sales Price by Year')
+        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
+        ax.grid(True, alpha=0.3, axis='y')
+
+    plt.tight_layout()
+    return fig
+
+
+def chart_png(aggregates, chart_type, directory=trends_dir):
+    """PNG bytes of a chart, drawn once per chart type and data version and then read from disk."""
+    import matplotlib.pyplot as plt
+
+    charts = os.path.join(directory, "charts")
+    slug = re.sub(r'[^a-z0-9]+', '-', chart_type.lower()).strip('-')
+    path = os.path.join(charts, f"{aggregates.version}-{slug}.png")
+    if not os.path.exists(path):
+        os.makedirs(charts, exist_ok=True)
+        fig = draw_chart(aggregates, chart_type)
+        try:
+            with atomic_path(path) as temporary:
+                fig.savefig(temporary, format="png")
+        finally:
+            plt.close(fig)
+
+        # Charts of older data versions are removed once a few newer versions have been drawn
+        latest = {}
+        for name in os.listdir(charts):
+            version = name.split("-", 1)[0]
+            latest[version] = max(latest.get(version, 0), os.path.getmtime(os.path.join(charts, name)))
+        stale = sorted(latest, key=latest.get, reverse=True)[keep_versions:]
+        for name in os.listdir(charts):
+            if name.split("-", 1)[0] in stale:
+                os.remove(os.path.join(charts, name))
+
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draw the Market Trends charts for a scraper output ahead of time.")
+    parser.add_argument("output", nargs="?", default="output.csv", help="scraper output to aggregate")
+    parser.add_argument("--directory", default=trends_dir, help="where the charts are kept")
+    parser.add_argument("--delta-dir", default=delta_dir, help="the scraper's --delta-dir, to catch the cached tables up from")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    dataset = load_dataset(args.output, deltas=args.delta_dir)
+    aggregates = TrendAggregates(sales_frame(derive_features(dataset), dataset['sales']))
+    for chart_type in chart_types:
+        chart_png(aggregates, chart_type, args.directory)
+    print(f"Aggregated {len(aggregates.rows):,} sales and drew {len(chart_types)} charts in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ShardQueue:
+    """SQLite work queue of address shards that any number of processes or machines can lease from.
+
+    A lease expires unless its worker heartbeats, so shards held by a worker that died go back
+    to pending and are leased again, up to `max_attempts` times. Machines can share the queue
+    through a common filesystem, as long as it supports SQLite's file locking.
+    """
+
+    def __init__(self, path="queue.db", lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS shards (
+                shard TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                parcels INTEGER,
+                error TEXT,
+                updated_at REAL
+            )""")
+
+    def add(self, shards):
+        """Queues shards that are not queued yet and returns how many were new."""
+        with self.lock:
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO shards (shard, updated_at) VALUES (?, ?)",
+                                [(shard, time.time()) for shard in shards])
+            return self.db.total_changes - before
+
+    def lease(self, worker):
+        """Leases the next pending shard to worker, or returns None when nothing is pending."""
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                # Shards whose worker stopped heartbeating are put back, or given up on after max_attempts
+                self.db.execute("""
+                    UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                        worker = NULL, error = COALESCE(error, 'lease expired'), updated_at = ?
+                    WHERE status = 'leased' AND lease_expires < ?""", (self.max_attempts, now, now))
+                found = self.db.execute("SELECT shard FROM shards WHERE status = 'pending' ORDER BY rowid LIMIT 1").fetchone()
+                if found:
+                    self.db.execute("""
+                        UPDATE shards SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                        WHERE shard = ?""", (worker, now + self.lease_seconds, now, found[0]))
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return found[0] if found else None
+
+    def heartbeat(self, shard, worker):
+        """Extends the lease and returns False if the shard has been taken away from worker."""
+        with self.lock:
+            updated = self.db.execute("UPDATE shards SET lease_expires = ?, updated_at = ? WHERE shard = ? AND worker = ? AND status = 'leased'",
+                                      (time.time() + self.lease_seconds, time.time(), shard, worker)).rowcount
+        return updated == 1
+
+    def complete(self, shard, worker, parcels):
+        with self.lock:
+            self.db.execute("UPDATE shards SET status = 'done', parcels = ?, error = NULL, updated_at = ? WHERE shard = ? AND worker = ?",
+                            (parcels, time.time(), shard, worker))
+
+    def fail(self, shard, worker, error):
+        """Puts the shard back for another attempt, or marks it failed once max_attempts is reached."""
+        with self.lock:
+            self.db.execute("""
+                UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    worker = NULL, error = ?, updated_at = ?
+                WHERE shard = ? AND worker = ?""", (self.max_attempts, str(error), time.time(), shard, worker))
+
+    def retry_failed(self):
+        """Gives every failed shard a fresh set of attempts."""
+        with self.lock:
+            return self.db.execute("UPDATE shards SET status = 'pending', attempts = 0, updated_at = ? WHERE status = 'failed'",
+                                   (time.time(),)).rowcount
+
+    def counts(self):
+        with self.lock:
+            found = self.db.execute("SELECT status, COUNT(*) FROM shards GROUP BY status").fetchall()
+        return {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0, **dict(found)}
+
+    def unfinished(self):
+        counts = self.counts()
+        return counts['pending'] + counts['leased']
+
+    def close(self):
+        self.db.close()
+
+
+class Heartbeat:
+    """Background thread that keeps a shard's lease alive while a worker scrapes it."""
+
+    def __init__(self, queue, shard, worker):
+        self.queue = queue
+        self.shard = shard
+        self.worker = worker
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(self.shard, self.worker):
+                print(f"Lost the lease on {self.shard}")
+                return
@@ -16,4 +16,4 @@ playwright install chromium
 
 # Run the scraper
 echo "Starting scraper..."
-python -m home_values.playwright_scraper
+python -m home_values.scraper "$@"
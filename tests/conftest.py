@@ -0,0 +1,85 @@
+"""A local stand-in for the assessor site, served from the pages in tests/fixtures."""
+from benchmarks.synthetic import page, table
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import os
+import re
+import threading
+import pytest
+
+fixtures = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Parcels 1000 to 1029 PEDALERS LN; the ones ending in 9 are vacant lots without a building record
+parcels = range(1000, 1030)
+
+
+def fixture(name):
+    with open(os.path.join(fixtures, name)) as file:
+        return file.read()
+
+
+class AssessorHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.respond(parse_qs(urlsplit(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.respond(parse_qs(self.rfile.read(length).decode()))
+
+    def respond(self, query):
+        path = urlsplit(self.path).path
+        self.server.hits[path] += 1
+        number = int(query.get("id", ["0"])[0])
+        if path == "/DefaultSearch.asp":
+            body = fixture("search.html")
+        elif path == "/Results.asp":
+            # Matches the search like SQL LIKE, where '%' stands for any run of characters, even none
+            pattern = re.escape(query.get("FormattedLocation", [""])[0]).replace("%", ".*")
+            body = page({4: table([[f'<a href="Detail.asp?id={n}">{n} PEDALERS LN</a>'] for n in parcels if re.fullmatch(pattern, f"{n} PEDALERS LN")])})
+        elif path == "/Detail.asp" and number in self.server.broken:
+            # An error page that still answers 200, which the parser cannot read an address from
+            body = fixture("search.html")
+        elif path == "/Detail.asp" and number in parcels:
+            body = fixture("detail_no_building.html" if number % 10 == 9 else "detail.html").replace("1104", str(number))
+        elif path == "/More.asp" and number in parcels:
+            body = fixture("more_detail.html")
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body.encode())))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def chromium_installed():
+    """Whether Playwright is installed and has a Chromium it can launch."""
+    try:
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as playwright:
+            playwright.chromium.launch().close()
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture
+def assessor():
+    """Serves the fixture site on a free local port. `hits` counts the requests made to each path.
+
+    Detail pages of the parcels added to `broken` are served as unreadable error pages.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AssessorHandler)
+    server.hits = Counter()
+    server.broken = set()
+    server.url = f"http://127.0.0.1:{server.server_port}/DefaultSearch.asp"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
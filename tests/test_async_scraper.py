@@ -0,0 +1,27 @@
+from home_values import async_scraper, http_scraper
+from tests.conftest import chromium_installed, parcels
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.skipif(not chromium_installed(), reason="Playwright has no Chromium to launch")
+
+address_ranges = ["100%", "101%", "102%"]
+
+
+def test_pages_share_the_queue(assessor):
+    rows = []
+    failed = asyncio.run(async_scraper.scrape(address_ranges, rows.append, requests_per_second=100, url=assessor.url,
+                                              contexts=2, pages_per_context=2))
+    assert failed == []
+    assert sorted(row['address'] for row in rows) == [f"{n} PEDALERS LN" for n in parcels]
+    assert assessor.hits['/Detail.asp'] == 30 and assessor.hits['/More.asp'] == 27
+
+
+def test_same_rows_as_http_backend(assessor):
+    browser_rows, http_rows = [], []
+    asyncio.run(async_scraper.scrape(address_ranges, browser_rows.append, requests_per_second=100, url=assessor.url))
+    http_scraper.scrape(address_ranges, http_rows.append, requests_per_second=100, url=assessor.url)
+
+    def by_address(rows):
+        return sorted(rows, key=lambda row: row['address'])
+    assert by_address(browser_rows) == by_address(http_rows)
@@ -0,0 +1,72 @@
+from home_values.chatgpt import chat_batch
+from home_values.pacing import Backoff
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import pytest
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    """An OpenAI-compatible chat completions endpoint. The prompt says how to answer: "429", "500", "empty" or "null"."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body['messages'][-1]['content']
+        with self.server.lock:
+            self.server.hits[prompt] += 1
+            first = self.server.hits[prompt] == 1
+        message = {"role": "assistant", "content": None if prompt == "null" else f"echo: {prompt}"}
+        if prompt in ("429", "500") and first:
+            status, answer = int(prompt), {"error": {"message": "try again"}}
+        else:
+            status, answer = 200, {"id": "c", "object": "chat.completion", "created": 0, "model": body['model'],
+                                   "choices": [] if prompt == "empty" else [{"index": 0, "message": message, "finish_reason": "stop"}],
+                                   "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8}}
+        data = json.dumps(answer).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChatHandler)
+    server.hits = Counter()
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_port}/v1"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run(api, prompts, cache):
+    return chat_batch(prompts, base_url=api.url, api_key="test", cache=cache, requests_per_minute=60_000,
+                      backoff=Backoff(base=0.01, cap=0.05, retries=3))
+
+
+def test_errors_stay_with_their_prompt(api, tmp_path):
+    prompts = ["a", "429", "500", "empty", "null", "b"]
+    results, stats = run(api, prompts, str(tmp_path / "cache.db"))
+    assert [result['prompt'] for result in results] == prompts
+    assert [result['response'] for result in results] == ["echo: a", "echo: 429", "echo: 500", None, None, "echo: b"]
+    assert results[3]['error'] and results[4]['error']
+    assert stats['retries'] == 2 and stats['failures'] == 2
+
+
+def test_only_answers_are_cached(api, tmp_path):
+    prompts = ["a", "empty", "null"]
+    run(api, prompts, str(tmp_path / "cache.db"))
+    api.hits.clear()
+
+    results, stats = run(api, prompts, str(tmp_path / "cache.db"))
+    assert [result['cached'] for result in results] == [True, False, False]
+    assert api.hits == Counter({"empty": 1, "null": 1})
+    assert stats['cache_hits'] == 1
@@ -0,0 +1,18 @@
+from home_values import crawl
+import json
+import sys
+import pandas as pd
+
+
+def test_workers_share_the_prefix_index(assessor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["crawl", "run", "--processes", "2", "--backend", "http", "--url", assessor.url,
+                                      "--rps", "100", "--poll", "0.1", "100%", "101%", "102%"])
+    crawl.main()
+
+    output = pd.read_csv("output.csv")
+    assert sorted(output['address']) == sorted(f"{n} PEDALERS LN" for n in range(1000, 1030))
+    # Both workers saved the index; neither dropped the patterns the other one searched
+    with open("prefix_index.json") as file:
+        assert {pattern: entry['results'] for pattern, entry in json.load(file).items()} == {"100%": 10, "101%": 10, "102%": 10}
+    assert assessor.hits['/Detail.asp'] == 30
@@ -0,0 +1,22 @@
+from benchmarks.synthetic import generate_rows
+from home_values import models
+from home_values.data import build_dataset, derive_features, excluded_addresses
+from home_values.sinks import write_rows
+
+
+def write_output(path, rows):
+    write_rows(rows, str(path))
+    return str(path)
+
+
+def test_excluded_addresses_are_dropped_for_every_caller(tmp_path):
+    rows = list(generate_rows(50, 0))
+    rows[3]['address'], rows[7]['address'] = excluded_addresses
+    df = derive_features(build_dataset(write_output(tmp_path / "output.csv", rows)))
+    assert len(df) == 48
+    assert not df['address'].isin(excluded_addresses).any()
+
+    # The dashboard and the CLIs hash the same frame, so they share one registered model
+    kept = [row for row in rows if row['address'] not in excluded_addresses]
+    other = derive_features(build_dataset(write_output(tmp_path / "kept.csv", kept)))
+    assert models.dataset_hash(df) == models.dataset_hash(other)
@@ -0,0 +1,75 @@
+from benchmarks.synthetic import generate_rows
+from home_values import data, diff
+from home_values.sinks import write_rows
+import copy
+import os
+import time
+import pandas as pd
+import pytest
+
+
+def write_output(path, rows):
+    # A new modification time even on filesystems with coarse timestamps
+    time.sleep(0.01)
+    write_rows(rows, str(path))
+    return str(path)
+
+
+def same_tables(first, second):
+    for name in data.tables:
+        a, b = (dataset[name].astype({column: object for column in dataset[name].select_dtypes(exclude='number')})
+                for dataset in (first, second))
+        pd.testing.assert_frame_equal(a.sort_values(['address', *a.columns[1:2]], ignore_index=True),
+                                      b.sort_values(['address', *b.columns[1:2]], ignore_index=True), check_dtype=False)
+
+
+@pytest.fixture
+def scrapes(tmp_path, monkeypatch):
+    """A first scrape recorded in a non-default delta directory, and its rows to change."""
+    monkeypatch.chdir(tmp_path)
+    rows = list(generate_rows(240, 0))
+    output = write_output(tmp_path / "output.csv", rows)
+    diff.record_scrape(output, "deltas")
+    data.load_dataset(output, deltas="deltas")
+    return output, rows
+
+
+def test_added_parcel_with_missing_int_is_replayed(scrapes, monkeypatch):
+    output, rows = scrapes
+    # garage_sqft is read as int64 until a parcel without it turns the column into float64
+    rows = [*copy.deepcopy(rows), {**copy.deepcopy(rows[0]), 'address': '1 NEW ST', 'garage_sqft': None}]
+    rows[5]['bedrooms'] += 1
+    write_output(output, rows)
+
+    header = diff.record_scrape(output, "deltas")
+    assert header['counts'] == {'add': 1, 'update': 1, 'remove': 0}
+
+    expected = data.build_dataset(output)
+    def full_parse(path):
+        raise AssertionError("the output was parsed again instead of replaying the delta")
+    monkeypatch.setattr(data, "build_dataset", full_parse)
+    same_tables(data.load_dataset(output, deltas="deltas"), expected)
+
+
+def test_outputs_sharing_a_cache_keep_their_tables(scrapes, tmp_path):
+    output, rows = scrapes
+    other = write_output(tmp_path / "other.csv", rows[:10])
+    data.load_dataset(other)
+    assert len(os.listdir(tmp_path / data.cache_dir)) == 2
+    assert os.path.isdir(tmp_path / data.cache_dir / data.source_id(output) / data.source_version(output))
+
+
+def test_loader_that_loses_the_race_uses_the_winners_tables(tmp_path, monkeypatch):
+    output = write_output(tmp_path / "output.csv", generate_rows(20, 0))
+    cache = str(tmp_path / "cache")
+    build_dataset = data.build_dataset
+
+    def racing_build(path):
+        # Another loader caches the same version while this one is still parsing
+        monkeypatch.setattr(data, "build_dataset", build_dataset)
+        data.load_dataset(path, cache)
+        return build_dataset(path)
+    monkeypatch.setattr(data, "build_dataset", racing_build)
+
+    assert len(data.load_dataset(output, cache)['properties']) == 20
+    assert os.listdir(os.path.join(cache, data.source_id(output))) == [data.source_version(output)]
@@ -0,0 +1,47 @@
+from benchmarks.synthetic import write_output
+from home_values.data import build_dataset, derive_features, filter_properties
+from home_values.explorer import PropertyIndex
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def df(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("explorer") / "output.csv")
+    write_output(path, 2000, seed=3)
+    return derive_features(build_dataset(path))
+
+
+def random_filters(df, rng):
+    """Bounds drawn from the column's own values, so edges are hit exactly, and sometimes reversed into an empty range."""
+    def bounds(column):
+        low, high = rng.choice(df[column].dropna().unique(), 2)
+        return (high, low) if rng.random() < 0.1 else (min(low, high), max(low, high))
+    min_sqft, max_sqft = bounds('total_sqft')
+    min_beds, max_beds = bounds('bedrooms')
+    min_year, max_year = bounds('year_built')
+    min_baths = rng.choice(df['bathrooms'].dropna().unique())
+    return dict(min_sqft=min_sqft, max_sqft=max_sqft, min_beds=min_beds, max_beds=max_beds, min_baths=min_baths,
+                min_year=min_year, max_year=max_year, has_garage=rng.choice(["Any", "Yes", "No"]))
+
+
+def test_index_matches_filter_properties(df):
+    index = PropertyIndex(df)
+    rng = np.random.default_rng(0)
+    empty = 0
+    for _ in range(300):
+        filters = random_filters(df, rng)
+        expected = filter_properties(df, **filters)
+        assert list(index.filter(**filters)['address']) == list(expected['address']), filters
+        empty += expected.empty
+    assert 0 < empty < 300
+
+
+def test_wide_open_and_garage_filters(df):
+    index = PropertyIndex(df)
+    everything = dict(min_sqft=0, max_sqft=np.inf, min_beds=0, max_beds=np.inf, min_baths=0, min_year=0, max_year=np.inf)
+    # Rows missing a filtered value never match, on either path
+    assert len(index.filter(**everything)) == len(filter_properties(df, **everything))
+    with_garage, without = (len(index.filter(**everything, has_garage=option)) for option in ("Yes", "No"))
+    assert with_garage + without == len(index.filter(**everything))
+    assert with_garage == len(filter_properties(df, **everything, has_garage="Yes"))
@@ -0,0 +1,57 @@
+from home_values import http_scraper
+from home_values.page_cache import PageCache
+from tests.conftest import parcels
+
+address_ranges = ["100%", "101%", "102%"]
+
+
+def scrape(assessor, cache=None):
+    rows = []
+    failed = http_scraper.scrape(address_ranges, rows.append, requests_per_second=100, url=assessor.url, cache=cache)
+    return sorted(rows, key=lambda row: row['address']), failed
+
+
+def test_scrapes_every_parcel(assessor):
+    rows, failed = scrape(assessor)
+    assert failed == []
+    assert [row['address'] for row in rows] == [f"{n} PEDALERS LN" for n in parcels]
+    assert rows[0]['square_feet'] == 2104 and rows[0]['market_values'] == {2024: 344000, 2023: 350000, 2022: 318000}
+    assert rows[9]['square_feet'] is None
+    # One search page and one result page per range, then one detail page per parcel and a more detail page per building
+    assert assessor.hits == {'/DefaultSearch.asp': 3, '/Results.asp': 3, '/Detail.asp': 30, '/More.asp': 27}
+
+
+def test_cached_rerun_makes_no_requests(assessor, tmp_path):
+    cache = PageCache(tmp_path / "cache")
+    first, _ = scrape(assessor, cache)
+    cache.close()
+    assessor.hits.clear()
+
+    cache = PageCache(tmp_path / "cache")
+    second, failed = scrape(assessor, cache)
+    assert failed == []
+    assert second == first
+    assert sum(assessor.hits.values()) == 0
+    assert cache.hits == 3 + 3 + 30 + 27
+    cache.close()
+
+
+def test_replay_never_touches_the_network(assessor, tmp_path):
+    cache = PageCache(tmp_path / "cache")
+    first, _ = scrape(assessor, cache)
+    cache.close()
+    assessor.hits.clear()
+
+    cache = PageCache(tmp_path / "cache", ttl_days=0, replay=True)
+    replayed, failed = scrape(assessor, cache)
+    assert failed == []
+    assert replayed == first
+    assert sum(assessor.hits.values()) == 0
+    cache.close()
+
+    # A range that was never fetched fails instead of reaching the site
+    cache = PageCache(tmp_path / "cache", replay=True)
+    rows = []
+    assert http_scraper.scrape(["103%"], rows.append, requests_per_second=100, url=assessor.url, cache=cache) == ["103%"]
+    assert rows == [] and sum(assessor.hits.values()) == 0
+    cache.close()
@@ -0,0 +1,22 @@
+from home_values.metrics import Metrics
+import socket
+import urllib.request
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def test_server_listens_on_loopback_only():
+    metrics = Metrics()
+    metrics.count('parcels', 3)
+    server = metrics.export(port=free_port())
+    try:
+        assert server.server_address[0] == "127.0.0.1"
+        body = urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics").read().decode()
+        assert "home_values_parcels_total 3" in body
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,38 @@
+from benchmarks.synthetic import write_output
+from home_values import model_selection, models
+from home_values.data import build_dataset, derive_features
+import pytest
+
+
+@pytest.fixture
+def df(tmp_path):
+    path = str(tmp_path / "output.csv")
+    write_output(path, 400, seed=0)
+    return derive_features(build_dataset(path))
+
+
+def test_leaderboard_round_trip(df, tmp_path):
+    directory = str(tmp_path / "models")
+    leaderboard = model_selection.run(df, n_splits=3, n_jobs=1, directory=directory)
+    assert len(leaderboard) == 8
+    assert sorted(leaderboard['target'].unique()) == ['market_value', 'sales_price']
+    for _, board in leaderboard.groupby('target'):
+        assert sorted(board['model']) == ['ElasticNet Regression', 'Lasso Regression', 'Linear Regression', 'Ridge Regression']
+        assert board['mse'].is_monotonic_increasing and (board['rmse'] > 0).all()
+
+    # What the dashboard reads back: the columns it shows, and the data version it compares against
+    read, report = model_selection.read_leaderboard(directory)
+    assert {'target', 'model', 'rmse', 'mae', 'r2', 'r2_std', 'fit_seconds'} <= set(read.columns)
+    assert read[['target', 'model']].equals(leaderboard[['target', 'model']])
+    assert report['dataset_hash'] == models.dataset_hash(df) and report['folds'] == 3
+
+
+def test_too_few_rows_writes_an_empty_leaderboard(df, tmp_path):
+    directory = str(tmp_path / "models")
+    assert model_selection.run(df.head(12), n_splits=50, n_jobs=1, directory=directory).empty
+    read, report = model_selection.read_leaderboard(directory)
+    assert read.empty and report['folds'] == 50
+
+
+def test_no_comparison_yet(tmp_path):
+    assert model_selection.read_leaderboard(str(tmp_path)) == (None, None)
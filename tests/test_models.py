@@ -0,0 +1,58 @@
+from benchmarks.synthetic import write_output
+from home_values import models
+from home_values.data import build_dataset, derive_features
+import json
+import os
+
+
+def features(tmp_path, parcels, seed=0):
+    path = str(tmp_path / f"output-{parcels}-{seed}.csv")
+    write_output(path, parcels, seed)
+    return derive_features(build_dataset(path))
+
+
+def no_training(df):
+    raise AssertionError("trained again although models for this dataset are saved")
+
+
+def test_second_load_does_not_train(tmp_path, monkeypatch):
+    df = features(tmp_path, 300)
+    directory = str(tmp_path / "models")
+    models.load_or_train(df, directory)
+    with open(os.path.join(directory, "latest.json")) as file:
+        latest = json.load(file)
+    assert latest['dataset_hash'] == models.dataset_hash(df)
+    assert latest['rows'] == len(models.training_frame(df)) < len(df)
+
+    monkeypatch.setattr(models, "train_models", no_training)
+    market_model, sales_model = models.load_or_train(df.copy(), directory)
+    assert len(market_model.predict(df[models.feature_columns].values[:5])) == 5
+
+
+def test_changed_data_retrains(tmp_path):
+    df = features(tmp_path, 300)
+    directory = str(tmp_path / "models")
+    models.load_or_train(df, directory)
+
+    changed = df.copy()
+    changed.loc[changed.index[0], 'bedrooms'] += 1
+    assert models.dataset_hash(changed) != models.dataset_hash(df)
+    models.load_or_train(changed, directory)
+    assert sorted(os.listdir(directory)) == sorted(["latest.json", "latest.json.lock",
+                                                   *(os.path.basename(models.artifact_path(models.dataset_hash(frame)))
+                                                     for frame in (df, changed))])
+
+
+def test_prunes_only_versions_latest_json_no_longer_lists(tmp_path, monkeypatch):
+    monkeypatch.setattr(models, "keep_versions", 1)
+    directory = str(tmp_path / "models")
+    frames = [features(tmp_path, 100, seed) for seed in range(3)]
+    for df in frames:
+        models.load_or_train(df, directory)
+
+    with open(os.path.join(directory, "latest.json")) as file:
+        versions = json.load(file)['versions']
+    assert versions == [models.dataset_hash(frames[2]), models.dataset_hash(frames[1])]
+    assert sorted(name for name in os.listdir(directory) if name.endswith(".joblib")) == sorted(
+        os.path.basename(models.artifact_path(version)) for version in versions)
+    assert models.load_models(models.dataset_hash(frames[0]), directory) is None
@@ -0,0 +1,99 @@
+from home_values import pacing
+from home_values.pacing import Backoff, Blocked, Pacer, TokenBucket
+from types import SimpleNamespace
+import random
+import pytest
+
+
+class Clock:
+    """Stands in for the time module: sleeping moves the clock on instead of waiting."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(pacing, "time", SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+
+def answers(*statuses):
+    """A request that answers with each status in turn and counts its calls."""
+    def request():
+        request.calls += 1
+        return SimpleNamespace(status_code=statuses[request.calls - 1])
+    request.calls = 0
+    return request
+
+
+@pytest.mark.parametrize("status", [403, 429, 500, 502, 503, 504])
+def test_blocking_and_server_errors_are_retried(clock, status):
+    pacer = Pacer(requests_per_second=4, backoff=Backoff(base=1, cap=10, retries=4))
+    request = answers(status, status, 200)
+    assert pacer.call(request).status_code == 200
+    assert request.calls == 3 and pacer.retries == 2
+    # Halved twice, then nudged back up by the fast success
+    assert pacer.bucket.rate == pytest.approx(4 / 4 * 1.1)
+
+
+def test_other_statuses_are_returned(clock):
+    pacer = Pacer(requests_per_second=4)
+    request = answers(404)
+    assert pacer.call(request).status_code == 404
+    assert request.calls == 1 and pacer.retries == 0
+
+
+def test_gives_up_after_the_retries(clock):
+    pacer = Pacer(requests_per_second=4, backoff=Backoff(base=1, cap=10, retries=2))
+    request = answers(503, 503, 503, 200)
+    with pytest.raises(Blocked):
+        pacer.call(request)
+    assert request.calls == 3
+
+
+def test_slow_requests_halve_the_rate_until_fast_ones_recover_it(clock):
+    pacer = Pacer(requests_per_second=8, slow_after=10)
+
+    def slow():
+        clock.now += 11
+        return SimpleNamespace(status_code=200)
+    for _ in range(6):
+        pacer.call(slow)
+    # Never below a sixteenth of the configured rate
+    assert pacer.bucket.rate == 0.5
+
+    for _ in range(40):
+        pacer.call(answers(200))
+    assert pacer.bucket.rate == 8
+
+
+def test_backoff_stays_within_its_jitter_limits():
+    random.seed(0)
+    backoff = Backoff(base=2, cap=30)
+    for attempt in range(8):
+        delays = [backoff.delay(attempt) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= min(30, 2 * 2 ** attempt)
+        # Full jitter spreads the delays over the whole range
+        assert max(delays) > 0.8 * min(30, 2 * 2 ** attempt)
+
+
+def test_bucket_holds_no_more_than_its_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    clock.now += 3600
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+
+    # Tokens given back are capped too
+    bucket.reserve(-10)
+    assert bucket.reserve(0) == 0 and bucket.tokens == 3
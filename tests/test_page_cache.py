@@ -0,0 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+from home_values.page_cache import CachedPage, PageCache
+
+
+def test_counts_from_many_threads(tmp_path):
+    cache = PageCache(str(tmp_path / "cache"))
+    cache.put("GET", "http://assessor.test/1", CachedPage("http://assessor.test/1", "<html>1</html>"))
+
+    def look_up(n):
+        return cache.get("GET", f"http://assessor.test/{n % 2}")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        pages = list(executor.map(look_up, range(2000)))
+    assert sum(page is not None for page in pages) == 1000
+    assert cache.stats()['hits'] == 1000 and cache.stats()['misses'] == 1000
+    cache.close()
@@ -0,0 +1,44 @@
+from home_values.metrics import Metrics
+from home_values.parcel import scrape_parcel, scrape_parcel_async
+from tests.conftest import fixture
+import asyncio
+import pytest
+
+pages = {"https://assessor/Detail.asp?id=1104": fixture("detail.html"), "https://assessor/More.asp?id=1104": fixture("more_detail.html")}
+
+
+def fetch(url, ready_selector):
+    if url not in pages:
+        raise ConnectionError(f"no page at {url}")
+    return pages[url], url
+
+
+def test_row_from_both_pages():
+    row = scrape_parcel(fetch, "https://assessor/Detail.asp?id=1104", Metrics(), set())
+    assert row['address'] == "1104 PEDALERS LN" and row['square_feet'] == 2104 and row['porch_sqft'] == 71
+
+
+def test_duplicate_address_is_skipped():
+    assert scrape_parcel(fetch, "https://assessor/Detail.asp?id=1104", Metrics(), {"1104 PEDALERS LN"}) is None
+
+
+def test_failed_more_detail_page_keeps_the_row():
+    def detail_only(url, ready_selector):
+        if "More" in url:
+            raise TimeoutError("more detail page did not load")
+        return fetch(url, ready_selector)
+    row = scrape_parcel(detail_only, "https://assessor/Detail.asp?id=1104", Metrics(), set())
+    assert row['market_values'] == {2024: 344000, 2023: 350000, 2022: 318000}
+    assert row['square_feet'] is None
+
+
+def test_failed_detail_page_raises():
+    with pytest.raises(ConnectionError):
+        scrape_parcel(fetch, "https://assessor/Detail.asp?id=1", Metrics(), set())
+
+
+def test_async_fetch():
+    async def load(url, ready_selector):
+        return fetch(url, ready_selector)
+    row = asyncio.run(scrape_parcel_async(load, "https://assessor/Detail.asp?id=1104", Metrics(), set()))
+    assert row['year_built'] == 2018
@@ -0,0 +1,61 @@
+from home_values.http_scraper import search_form
+from home_values.parsing import parse_detail_page, parse_more_detail_page, result_links
+from tests.conftest import fixture
+
+base_url = "https://docs.oklahomacounty.org/AssessorWP5/Results.asp"
+
+
+def test_detail_page():
+    row, more_detail_url, errors = parse_detail_page(fixture("detail.html"), base_url)
+    assert errors == []
+    assert row['address'] == "1104 PEDALERS LN"
+    # Market values stop at the first one under $100,000; sales under $150,000 are skipped
+    assert row['market_values'] == {2024: 344000, 2023: 350000, 2022: 318000}
+    assert row['sales_prices'] == {2024: 301000, 2019: 232500}
+    assert more_detail_url == "https://docs.oklahomacounty.org/AssessorWP5/More.asp?id=1104"
+
+
+def test_detail_page_without_building():
+    row, more_detail_url, errors = parse_detail_page(fixture("detail_no_building.html"), base_url)
+    assert errors == []
+    assert more_detail_url is None
+    assert row['sales_prices'] == {}
+    assert row['square_feet'] is None
+
+
+def test_more_detail_page():
+    fields, errors = parse_more_detail_page(fixture("more_detail.html"))
+    assert errors == []
+    assert fields == {'square_feet': 2104, 'year_built': 2018, 'bedrooms': 3, 'bathrooms': 2.5, 'garage_sqft': 480,
+                      'garage_apt_sqft': 0, 'porch_sqft': 71, 'unfin_attic_sqft': 120}
+
+
+def test_result_links_are_absolute_and_unique():
+    assert result_links(fixture("results.html"), base_url) == [
+        "https://docs.oklahomacounty.org/AssessorWP5/Detail.asp?id=1104",
+        "https://docs.oklahomacounty.org/AssessorWP5/Detail.asp?id=1105",
+        "https://docs.oklahomacounty.org/AssessorWP5/Detail.asp?id=1106",
+    ]
+
+
+def test_search_form():
+    action, method, fields = search_form(fixture("search.html"), "https://docs.oklahomacounty.org/AssessorWP5/DefaultSearch.asp")
+    assert action == base_url
+    assert method == "post"
+    # Reset buttons are not submitted with the form
+    assert fields == {'Mode': "Search", 'FormattedLocation': "", 'Submit': "Submit"}
+
+
+def test_bad_cells_are_reported_and_skipped():
+    # One market value reads "N/A" and one sale date "Pending"; the rest of the page is still read
+    row, more_detail_url, errors = parse_detail_page(fixture("detail_malformed.html"), base_url)
+    assert row['market_values'] == {2024: 344000, 2022: 318000}
+    assert row['sales_prices'] == {2024: 301000}
+    assert more_detail_url is not None
+    assert [field for field, _ in errors] == ['market_values', 'sales_prices']
+
+
+def test_more_detail_page_without_building_table():
+    fields, errors = parse_more_detail_page(fixture("detail.html"))
+    assert [field for field, _ in errors] == ['square_feet', 'year_built', 'bedrooms', 'bathrooms']
+    assert fields == {'garage_sqft': 0, 'garage_apt_sqft': 0, 'porch_sqft': 0, 'unfin_attic_sqft': 0}
@@ -0,0 +1,31 @@
+from home_values import http_scraper
+from home_values.parsing import result_links
+from home_values.planner import SearchPlanner, split_shard
+from tests.conftest import fixture
+import pytest
+
+
+def test_split_keeps_the_bare_prefix():
+    assert split_shard("1%%% Oso Ave") == ["1 Oso Ave", *(f"1{digit}%% Oso Ave" for digit in range(10))]
+    assert split_shard("10%") == ["10", *(f"10{digit}%" for digit in range(10))]
+    assert split_shard("%") == [f"{digit}%" for digit in range(10)]
+    assert split_shard("1 Oso Ave") == ["1 Oso Ave"]
+
+
+def test_page_without_results_table_is_not_an_empty_search():
+    with pytest.raises(LookupError):
+        result_links(fixture("search.html"), "http://assessor.test/")
+
+
+def test_next_run_skips_empty_prefixes(assessor, tmp_path):
+    index = str(tmp_path / "prefix_index.json")
+    rows = []
+    planner = SearchPlanner(index, max_results=11)
+    http_scraper.scrape(["10%"], rows.append, requests_per_second=100, url=assessor.url, planner=planner)
+    assert len(rows) == 30
+    # "10%" has 30 results, so "10" and "100%".."109%" are searched too; only 100-102 have parcels
+    assert planner.counts['searches'] == 12 and planner.counts['split'] == 1
+
+    planner = SearchPlanner(index, max_results=11)
+    assert planner.plan(["10%"]) == ["100%", "101%", "102%"]
+    assert planner.counts['skipped_empty'] == 8
@@ -0,0 +1,55 @@
+from benchmarks.synthetic import generate_rows
+from home_values import models
+from home_values.data import build_dataset, derive_features
+from home_values.predict import score_file
+from home_values.sinks import write_rows
+import os
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="module")
+def fitted(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("data") / "output.csv")
+    write_rows(generate_rows(400, 0), path)
+    return models.train_models(derive_features(build_dataset(path)))
+
+
+@pytest.fixture
+def listings(tmp_path):
+    frame = pd.DataFrame(list(generate_rows(250, 1))).drop(columns=['market_values', 'sales_prices'])
+    path = tmp_path / "listings.csv"
+    frame.to_csv(path, index=False)
+    return path, frame
+
+
+@pytest.mark.parametrize("extension", [".csv", ".jsonl", ".parquet"])
+def test_scores_every_chunk(fitted, listings, tmp_path, extension):
+    path, frame = listings
+    output = str(tmp_path / f"predictions{extension}")
+    assert score_file(str(path), output, *fitted, chunk_size=100)['rows'] == 250
+    if extension == ".parquet":
+        scored = pd.read_parquet(output)
+    elif extension == ".jsonl":
+        scored = pd.read_json(output, lines=True)
+    else:
+        scored = pd.read_csv(output)
+    assert len(scored) == 250 and 'predicted_sales_price' in scored
+
+
+def test_failed_run_keeps_previous_output(fitted, listings, tmp_path):
+    path, frame = listings
+    output = str(tmp_path / "predictions.csv")
+    score_file(str(path), output, *fitted, chunk_size=100)
+    with open(output) as file:
+        before = file.read()
+
+    # The third chunk cannot be scored, after two chunks were already written
+    frame['bedrooms'] = frame['bedrooms'].astype(object)
+    frame.loc[220, 'bedrooms'] = "three"
+    frame.to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        score_file(str(path), output, *fitted, chunk_size=100)
+    with open(output) as file:
+        assert file.read() == before
+    assert sorted(os.listdir(tmp_path)) == ["listings.csv", "predictions.csv"]
@@ -0,0 +1,88 @@
+from home_values import scraper
+from tests.conftest import chromium_installed
+import json
+import sqlite3
+import sys
+import pandas as pd
+import pytest
+
+address_ranges = ["100%", "101%", "102%"]
+
+
+def run_main(monkeypatch, assessor, *options):
+    monkeypatch.setattr(sys, "argv", ["scraper", "--url", assessor.url, "--rps", "100", *options, *address_ranges])
+    scraper.main()
+    return pd.read_csv("output.csv")
+
+
+@pytest.mark.parametrize("backend", [
+    "http",
+    pytest.param("playwright", marks=pytest.mark.skipif(not chromium_installed(), reason="Playwright has no Chromium to launch")),
+])
+def test_main(backend, assessor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    output = run_main(monkeypatch, assessor, "--backend", backend)
+    assert len(output) == 30 and output['address'].is_unique
+    assert json.loads((tmp_path / "run_summary.json").read_text())['counters']['parcels'] == 30
+    assert (tmp_path / ".deltas" / "snapshot" / "version").exists()
+
+
+def test_main_replays_the_cache(assessor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = run_main(monkeypatch, assessor, "--backend", "http")
+    assessor.hits.clear()
+
+    replayed = run_main(monkeypatch, assessor, "--replay")
+    assert sum(assessor.hits.values()) == 0
+    pd.testing.assert_frame_equal(replayed.sort_values('address', ignore_index=True), first.sort_values('address', ignore_index=True))
+    assert json.loads((tmp_path / "run_summary.json").read_text())['counters']['cache_hits'] == 3 + 3 + 30 + 27
+
+
+def test_rerun_keeps_parcels_it_skips(assessor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run_main(monkeypatch, assessor, "--backend", "http", "--no-cache")
+    assessor.hits.clear()
+
+    # Every parcel is already in the checkpoint, so nothing is fetched again but all of them are written
+    output = run_main(monkeypatch, assessor, "--backend", "http", "--no-cache")
+    assert assessor.hits['/Detail.asp'] == 0
+    assert len(output) == 30
+
+
+def test_rerun_fetches_only_stale_parcels(assessor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run_main(monkeypatch, assessor, "--backend", "http", "--no-cache")
+    with sqlite3.connect("checkpoint.db") as db:
+        db.execute("UPDATE parcels SET fetched_at = fetched_at - 40 * 86400 WHERE url LIKE '%id=100_'")
+    assessor.hits.clear()
+
+    output = run_main(monkeypatch, assessor, "--backend", "http", "--no-cache", "--max-age", "30")
+    assert assessor.hits['/Detail.asp'] == 10
+    assert len(output) == 30
+
+
+def test_rerun_retries_failed_parcels(assessor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assessor.broken.update({1004, 1015})
+    output = run_main(monkeypatch, assessor, "--backend", "http", "--no-cache")
+    assert len(output) == 28
+
+    assessor.broken.clear()
+    assessor.hits.clear()
+    output = run_main(monkeypatch, assessor, "--backend", "http", "--no-cache")
+    assert assessor.hits['/Detail.asp'] == 2
+    assert len(output) == 30 and {"1004 PEDALERS LN", "1015 PEDALERS LN"} <= set(output['address'])
+
+
+def test_output_keeps_rows_of_earlier_runs(assessor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["scraper", "--url", assessor.url, "--rps", "100", "--backend", "http", "100%"])
+    scraper.main()
+    assessor.hits.clear()
+
+    # A run over other ranges writes its own parcels and the ones the earlier run finished
+    monkeypatch.setattr(sys, "argv", ["scraper", "--url", assessor.url, "--rps", "100", "--backend", "http", "101%"])
+    scraper.main()
+    output = pd.read_csv("output.csv")
+    assert assessor.hits['/Detail.asp'] == 10
+    assert sorted(output['address']) == [f"{n} PEDALERS LN" for n in range(1000, 1020)]
@@ -0,0 +1,38 @@
+from benchmarks.synthetic import generate_rows
+from home_values.sinks import open_sink, write_rows
+import os
+import pandas as pd
+import pytest
+
+formats = [".csv", ".jsonl", ".parquet"]
+
+
+@pytest.mark.parametrize("extension", formats)
+def test_batches_reach_every_table(tmp_path, extension):
+    rows = list(generate_rows(120, 0))
+    path = str(tmp_path / f"output{extension}")
+    assert write_rows(rows, path, batch_size=50) == 120
+    assert sorted(os.listdir(tmp_path)) == sorted(f"output{table}{extension}" for table in ("", "_market_values", "_sales"))
+    if extension == ".parquet":
+        market_values = pd.read_parquet(tmp_path / "output_market_values.parquet")
+    elif extension == ".jsonl":
+        market_values = pd.read_json(tmp_path / "output_market_values.jsonl", lines=True)
+    else:
+        market_values = pd.read_csv(tmp_path / "output_market_values.csv")
+    assert len(market_values) == sum(len(row['market_values']) for row in rows)
+
+
+@pytest.mark.parametrize("extension", formats)
+def test_error_keeps_previous_output(tmp_path, extension):
+    path = str(tmp_path / f"output{extension}")
+    write_rows(generate_rows(10, 0), path)
+    before = {name: (tmp_path / name).read_bytes() for name in os.listdir(tmp_path)}
+
+    with pytest.raises(RuntimeError):
+        with open_sink(path, batch_size=5) as sink:
+            for row in generate_rows(20, 1):
+                sink.write(row)
+            raise RuntimeError("scrape failed")
+
+    # Batches already flushed are thrown away with the partial files
+    assert {name: (tmp_path / name).read_bytes() for name in os.listdir(tmp_path)} == before
@@ -0,0 +1,38 @@
+from benchmarks.synthetic import write_output
+from home_values import trends
+from home_values.data import build_dataset, derive_features, sales_frame, split_sales, yearly_stats
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def df_sales(tmp_path):
+    path = str(tmp_path / "output.csv")
+    write_output(path, 300, seed=0)
+    dataset = build_dataset(path)
+    return sales_frame(derive_features(dataset), dataset['sales'])
+
+
+def test_aggregates_match_the_sales(df_sales):
+    aggregates = trends.TrendAggregates(df_sales)
+    pd.testing.assert_frame_equal(aggregates.yearly_stats(), yearly_stats(df_sales))
+    np.testing.assert_allclose(aggregates.trend('all'), np.polyfit(df_sales['year'], df_sales['price_per_sqft'], 2))
+    initial = split_sales(df_sales)[0]
+    np.testing.assert_allclose(aggregates.trend('initial'), np.polyfit(initial['year'], initial['price_per_sqft'], 2), rtol=1e-4)
+    assert aggregates.mean_price_per_sqft(2024) == pytest.approx(df_sales.loc[df_sales['year'] >= 2024, 'price_per_sqft'].mean())
+    assert aggregates.street_stats()['# Sales'].sum() == len(df_sales)
+
+
+def test_charts_are_keyed_by_the_sales(df_sales, tmp_path):
+    directory = str(tmp_path / "trends")
+    aggregates = trends.TrendAggregates(df_sales)
+    chart = trends.chart_png(aggregates, trends.chart_types[0], directory)
+
+    # The same sales share the chart whoever built them; a filtered population gets its own
+    assert trends.TrendAggregates(df_sales.copy()).version == aggregates.version
+    filtered = trends.TrendAggregates(df_sales[df_sales['year'] >= 2020])
+    assert filtered.version != aggregates.version
+    assert trends.chart_png(filtered, trends.chart_types[0], directory) != chart
+    assert len(os.listdir(os.path.join(directory, "charts"))) == 2
@@ -0,0 +1,65 @@
+from home_values import work_queue
+from home_values.work_queue import ShardQueue
+import pytest
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(work_queue.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = ShardQueue(str(tmp_path / "queue.db"), lease_seconds=10, max_attempts=2)
+    queue.add(["100%", "101%"])
+    yield queue
+    queue.close()
+
+
+def test_expired_lease_is_handed_out_again(queue, clock):
+    assert queue.lease("a") == "100%"
+    assert queue.lease("b") == "101%"
+    assert queue.lease("b") is None
+
+    # Worker a died; once its lease runs out the shard goes to whoever asks next
+    clock.now += 11
+    assert queue.lease("b") == "100%"
+    assert not queue.heartbeat("100%", "a")
+    assert queue.heartbeat("100%", "b")
+
+
+def test_heartbeat_extends_the_lease(queue, clock):
+    assert queue.lease("a") == "100%"
+    queue.lease("a")
+    for _ in range(3):
+        clock.now += 8
+        assert queue.heartbeat("100%", "a")
+    assert queue.lease("b") == "101%"
+    assert queue.counts()['leased'] == 2
+
+
+def test_shard_fails_after_max_attempts(queue, clock):
+    assert queue.lease("a") == "100%"
+    queue.fail("100%", "a", "search failed")
+    assert queue.lease("a") == "100%"
+    queue.fail("100%", "a", "search failed")
+    assert queue.counts() == {'pending': 1, 'leased': 0, 'done': 0, 'failed': 1}
+
+    # Expired leases count as attempts too
+    assert queue.lease("a") == "101%"
+    clock.now += 11
+    assert queue.lease("b") == "101%"
+    clock.now += 11
+    assert queue.lease("b") is None
+    assert queue.counts()['failed'] == 2
+    assert queue.retry_failed() == 2 and queue.unfinished() == 2